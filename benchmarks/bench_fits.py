@@ -0,0 +1,72 @@
+import numpy as np
+from common import dimer_rundown, ph_embryos, rundown
+
+from src.dimer_model_fit import EnergiesConfidenceIntervalPaired, model_m_from_c
+from src.rundowns_regression import ExponentConfidenceInterval
+
+"""
+Model fitting benchmarks
+
+"""
+
+
+class TimeExponentConfidenceInterval:
+    params = [["ph", 100, 1000], ["polyfit", "vectorized"]]
+    param_names = ["dataset", "method"]
+
+    def setup(self, dataset, method):
+        if dataset == "ph":
+            df = ph_embryos()
+            self.df = df[(df.Cyt > 0) & (df.Mem_post > 0)]
+        else:
+            self.df = rundown(dataset)
+
+    def time_bootstrap(self, dataset, method):
+        analysis = ExponentConfidenceInterval(
+            self.df, method=method, n_bootstrap=1000, seed=0, cache=False
+        )
+        analysis.all_fits_lower
+
+
+class TimeEnergiesConfidenceIntervalPaired:
+    params = [[50, 200], [False, True]]
+    param_names = ["n", "fast_fit"]
+
+    def setup(self, n, fast_fit):
+        self.df = dimer_rundown(n)
+
+    def analysis(self, fast_fit, ci_method="bootstrap"):
+        return EnergiesConfidenceIntervalPaired(
+            self.df,
+            log=True,
+            p0=(6.446, 6.446, 2.5),
+            fix_wt=True,
+            seed=0,
+            fast_fit=fast_fit,
+            n_bootstrap=50,
+            cache=False,
+            ci_method=ci_method,
+        )
+
+    def time_full_fit(self, n, fast_fit):
+        self.analysis(fast_fit).res_y
+
+    def time_bootstrap(self, n, fast_fit):
+        self.analysis(fast_fit).all_fits_lower
+
+    def time_profile(self, n, fast_fit):
+        self.analysis(fast_fit, ci_method="profile").all_fits_lower
+
+
+class TimeModel:
+    params = [[1000, 100000, 1000000], [False, True]]
+    param_names = ["n", "fast"]
+
+    def setup(self, n, fast):
+        rng = np.random.default_rng(0)
+        self.ka = 10 ** rng.uniform(4, 8, n)
+        self.km = 10 ** rng.uniform(1, 4, n)
+        self.c = 10 ** rng.uniform(-9, -5, n)
+
+    def time_model_m_from_c(self, n, fast):
+        model_m_from_c(self.ka, self.km, self.c, fast=fast)
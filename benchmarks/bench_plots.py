@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import matplotlib.pyplot as plt
+import numpy as np
+from common import groups
+
+from src.figures import export_figure
+from src.plottling import dataplot, random_grouped_scatter
+
+"""
+Plotting benchmarks
+
+"""
+
+
+class TimeRandomGroupedScatter:
+    params = [100, 500, 2000]
+    param_names = ["n"]
+
+    def setup(self, n):
+        # Four groups of n / 4 points (two colors, two markers)
+        rng = np.random.default_rng(0)
+        self.groups = [
+            (rng.normal(0, 1, n // 4), rng.normal(0, 1, n // 4), color, marker)
+            for color, marker in [
+                ("tab:blue", "o"),
+                ("tab:blue", "^"),
+                ("tab:orange", "o"),
+                ("tab:orange", "^"),
+            ]
+        ]
+
+    def time_plot(self, n):
+        # Includes drawing, where the cost of many separate artists shows up
+        fig, ax = plt.subplots()
+        r = random_grouped_scatter()
+        for x, y, color, marker in self.groups:
+            r.add(x, y, color, marker)
+        r.plot(ax)
+        fig.canvas.draw()
+        plt.close(fig)
+
+
+class TimeDataplot:
+    params = [50, 300, 1000]
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.df = groups(n, n_groups=3)
+
+    def time_dataplot(self, n):
+        # Layouts come from the cache after the first call, as when a notebook is re-run
+        fig, ax = plt.subplots(figsize=(6, 4))
+        dataplot(
+            self.df, "x", "y", ax, order=["g0", "g1", "g2"], hue="x", linewidth=0.5
+        )
+        fig.canvas.draw()
+        plt.close(fig)
+
+
+class TimeExportFigure:
+    params = [False, True]
+    param_names = ["cached"]
+
+    def setup(self, cached):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "Figs", "dataplot")
+        self.fig, ax = plt.subplots(figsize=(3, 3))
+        dataplot(groups(30, n_groups=3), "x", "y", ax, order=["g0", "g1", "g2"])
+        export_figure(self.fig, self.path)
+
+    def teardown(self, cached):
+        plt.close(self.fig)
+        self.tmp.cleanup()
+
+    def time_export_figure(self, cached):
+        # Cached: the figure is unchanged since the export in setup, so only hashed
+        export_figure(self.fig, self.path, cache=cached)
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from common import data_path, groups, ph_embryos
+
+from src.stats import add_stats_table_row, bootstrap, bootstrap_effect_size_pd
+
+"""
+Bootstrap and stats table benchmarks
+
+"""
+
+
+class TimeBootstrap:
+    params = [30, 300, 3000]
+    param_names = ["n"]
+    niter = 10000
+
+    def setup(self, n):
+        rng = np.random.default_rng(0)
+        self.data = [rng.normal(0, 1, n), rng.normal(1, 1, n)]
+
+    def time_loop(self, n):
+        np.random.seed(0)
+        bootstrap(self.data, lambda x: np.mean(x[1]) - np.mean(x[0]), niter=self.niter)
+
+    def time_batch(self, n):
+        np.random.seed(0)
+        bootstrap(
+            self.data,
+            lambda x: np.mean(x[1]) - np.mean(x[0]),
+            niter=self.niter,
+            batch=True,
+            batch_func=lambda x: np.mean(x[1], axis=-1) - np.mean(x[0], axis=-1),
+        )
+
+
+class TimeBootstrapEffectSize:
+    params = ["ph", 30, 300, 3000]
+    param_names = ["dataset"]
+
+    def setup(self, dataset):
+        if dataset == "ph":
+            # Membrane to cytoplasm ratio, wild type vs RNAi
+            df = ph_embryos()
+            df["x"] = np.where(df.RNAi == "wt", "g0", "g1")
+            df["y"] = df.Mem_post / df.Cyt
+            self.df = df
+        else:
+            self.df = groups(dataset)
+
+    def time_bootstrap_effect_size_pd(self, dataset):
+        np.random.seed(0)
+        bootstrap_effect_size_pd(self.df, x="x", y="y", a="g0", b="g1", niter=10000)
+
+
+class TimeAddStatsTableRow:
+    params = ["stats_table", 1000]
+    param_names = ["table"]
+
+    def setup(self, table):
+        # Work on a copy of the stats table (or a synthetic one with this many rows)
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "stats_table.csv")
+        if table == "stats_table":
+            shutil.copy(data_path + "stats_table.csv", self.path)
+        else:
+            df = pd.read_csv(data_path + "stats_table.csv")
+            df = df.iloc[np.arange(table) % len(df)].copy()
+            df["Key"] = ["key%d" % i for i in range(table)]
+            df.to_csv(self.path, index=False)
+        rng = np.random.default_rng(0)
+        self.distribution = rng.normal(0, 1, 10000)
+
+    def teardown(self, table):
+        shutil.rmtree(self.tmp)
+
+    def time_add_stats_table_row(self, table):
+        add_stats_table_row(
+            figure=1,
+            panel="A",
+            sample_a="a",
+            sample_b="b",
+            measure="Measure",
+            effect_size=0.5,
+            sample_size=(10, 10),
+            probability_distribution=self.distribution,
+            key="benchmark",
+            df_path=self.path,
+        )
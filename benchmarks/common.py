@@ -0,0 +1,78 @@
+import os
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.summary import summarise_quantification  # noqa: E402
+
+"""
+Datasets shared by the benchmarks
+
+"""
+
+data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/")
+
+
+def ph_embryos() -> pd.DataFrame:
+    """
+    PH embryos (data/ph_embryos.csv) with their summary statistics (Cyt, Mem_post etc.).
+    """
+    df = pd.read_csv(data_path + "ph_embryos.csv")
+    df_quantification = pd.read_csv(data_path + "ph_quantification.csv")
+    df = pd.merge(df, summarise_quantification(df_quantification), on="EmbryoID")
+    df["UniPol"] = "Uni"
+    return df
+
+
+def rundown(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic rundown dataset: n embryos with a power-law relationship between membrane
+    and cytoplasmic concentration (exponent 1.5), as in ExponentConfidenceInterval.
+    """
+    rng = np.random.default_rng(seed)
+    cyt = 10 ** rng.uniform(-1, 1, n)
+    mem = cyt**1.5 * 10 ** rng.normal(0, 0.1, n)
+    return pd.DataFrame(
+        {"Cyt": cyt, "Mem_post": mem, "Mem_tot": mem / 2, "UniPol": "Uni"}
+    )
+
+
+def dimer_rundown(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic paired rundown dataset for EnergiesConfidenceIntervalPaired: n embryos of
+    each genotype (WT and L109R), generated from the dimer model with log-normal noise.
+    Concentrations are in molar.
+    """
+    from src.dimer_model_fit import model_m_from_c
+
+    rng = np.random.default_rng(seed)
+    genotype = np.repeat(["WT", "L109R"], n)
+    ka = np.where(genotype == "WT", 10**6.446, 10**5.7)
+    cyt = 10 ** rng.uniform(-8, -6, 2 * n)
+    mem = model_m_from_c(ka, 10**2.4, cyt) * 10 ** rng.normal(0, 0.05, 2 * n)
+    return pd.DataFrame(
+        {
+            "Cyt": cyt,
+            "Mem_post": mem,
+            "Mem_tot": mem / 2,
+            "Genotype": genotype,
+            "UniPol": "Uni",
+        }
+    )
+
+
+def groups(n: int, n_groups: int = 2, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic dataset of n points in each of n_groups categories (columns x and y).
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "x": np.repeat(["g%d" % i for i in range(n_groups)], n),
+            "y": rng.normal(np.repeat(np.arange(n_groups), n), 1),
+        }
+    )
@@ -0,0 +1,210 @@
+# python benchmarks/run.py run [--filter PATTERN] [--repeat N] [--output FILE]
+# python benchmarks/run.py compare BASE NEW [--threshold FRACTION]
+
+import argparse
+import datetime
+import glob
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+"""
+Benchmark suite for the hot paths in src
+
+Benchmarks are written in the style of asv (airspeed velocity): each bench_*.py module
+contains Time* classes, whose time_* methods are timed for every combination of the
+class's params (passed to setup, the time_* methods and teardown).
+
+run times every benchmark and saves the results as JSON (by default to
+.cache/benchmarks/<commit>.json). compare reports the change in time of each benchmark
+between two results files, and exits with status 1 if any benchmark is slower by more
+than the threshold.
+
+"""
+
+benchmarks_path = os.path.dirname(os.path.abspath(__file__))
+results_path = os.path.join(benchmarks_path, "../.cache/benchmarks/")
+
+
+def discover(pattern=None):
+    """
+    Yields (name, class, method name, params) for every benchmark matching pattern.
+    """
+    sys.path.insert(0, benchmarks_path)
+    for path in sorted(glob.glob(os.path.join(benchmarks_path, "bench_*.py"))):
+        module = importlib.import_module(os.path.basename(path)[:-3])
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if not cls_name.startswith("Time") or cls.__module__ != module.__name__:
+                continue
+
+            # Parameter combinations (a list, or a list of lists with param_names)
+            params = getattr(cls, "params", [None])
+            names = getattr(cls, "param_names", [])
+            if len(names) > 1:
+                combinations = list(itertools.product(*params))
+            else:
+                combinations = [(p,) if p is not None else () for p in params]
+
+            for method in sorted(m for m in dir(cls) if m.startswith("time_")):
+                for p in combinations:
+                    name = "%s.%s.%s(%s)" % (
+                        module.__name__,
+                        cls_name,
+                        method,
+                        ", ".join("%s=%s" % (k, v) for k, v in zip(names, p)),
+                    )
+                    if pattern is None or re.search(pattern, name):
+                        yield name, cls, method, p
+
+
+def time_benchmark(cls, method, params, repeat=5, min_time=0.01):
+    """
+    Times one benchmark.
+
+    The benchmark is run once as a warm-up, then repeat samples are timed. Fast
+    benchmarks are called several times per sample, so that each sample lasts at least
+    min_time seconds.
+
+    Returns:
+        dict: median and minimum time per call (seconds), number of samples and number
+            of calls per sample
+    """
+    instance = cls()
+    if hasattr(instance, "setup"):
+        instance.setup(*params)
+    try:
+        func = getattr(instance, method)
+        start_time = time.perf_counter()
+        func(*params)
+        number = max(1, int(min_time / max(time.perf_counter() - start_time, 1e-9)))
+        samples = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            for _ in range(number):
+                func(*params)
+            samples.append((time.perf_counter() - start_time) / number)
+    finally:
+        if hasattr(instance, "teardown"):
+            instance.teardown(*params)
+    samples.sort()
+    return {
+        "median": samples[len(samples) // 2],
+        "min": samples[0],
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=benchmarks_path,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args):
+    results = {}
+    for name, cls, method, params in discover(args.filter):
+        results[name] = time_benchmark(cls, method, params, repeat=args.repeat)
+        print("%-90s %10.3fms" % (name, results[name]["median"] * 1e3), flush=True)
+
+    output = {
+        "meta": {
+            "commit": commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+        },
+        "results": results,
+    }
+    path = args.output or os.path.join(results_path, output["meta"]["commit"] + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=1)
+    print("Saved results to %s" % path)
+
+
+def compare(args):
+    """
+    Returns:
+        int: 1 if any benchmark slowed down by more than the threshold, otherwise 0
+    """
+    with open(args.base) as f:
+        base = json.load(f)["results"]
+    with open(args.new) as f:
+        new = json.load(f)["results"]
+
+    print("%-90s %12s %12s %8s" % ("Benchmark", "base", "new", "ratio"))
+    regressions = []
+    for name in sorted(set(base) | set(new)):
+        if name not in base or name not in new:
+            print("%-90s %s" % (name, "new" if name in new else "removed"))
+            continue
+        t_base, t_new = base[name]["median"], new[name]["median"]
+        ratio = t_new / t_base
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 / (1 + args.threshold):
+            flag = "  faster"
+        print(
+            "%-90s %10.3fms %10.3fms %7.2fx%s"
+            % (name, t_base * 1e3, t_new * 1e3, ratio, flag)
+        )
+
+    if regressions:
+        print(
+            "\n%d benchmark(s) slower by more than %d%%"
+            % (len(regressions), args.threshold * 100)
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    parser_run = subparsers.add_parser("run", help="run benchmarks and save results")
+    parser_run.add_argument(
+        "--filter", help="only run benchmarks whose name matches this regex"
+    )
+    parser_run.add_argument(
+        "--repeat", type=int, default=5, help="number of timed samples per benchmark"
+    )
+    parser_run.add_argument(
+        "--output", help="results file (default .cache/benchmarks/<commit>.json)"
+    )
+
+    parser_compare = subparsers.add_parser("compare", help="compare two results files")
+    parser_compare.add_argument("base", help="results file to compare against")
+    parser_compare.add_argument("new", help="results file to check")
+    parser_compare.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="fractional slowdown to flag (default 0.2, i.e. 20%%)",
+    )
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
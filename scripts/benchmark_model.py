@@ -0,0 +1,64 @@
+# python benchmark_model.py [--repeat N] [--n N]
+
+import argparse
+import time
+
+import numpy as np
+
+from src.dimer_model_fit import (
+    jac_m_from_c,
+    model_log_paired,
+    model_m_from_c,
+    model_m_from_c_fast,
+)
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--repeat", type=int, default=20, help="number of calls to average")
+parser.add_argument("--n", type=int, default=10**6, help="number of points")
+args = parser.parse_args()
+
+
+def mean_time(func, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start_time) / repeat
+
+
+# Accuracy against the full expression, over a grid of c * ka and km (log10 units)
+print("Accuracy (relative error of model_m_from_c_fast)")
+print("%-22s %12s %12s" % ("log10(c * ka)", "median", "max"))
+log_kms = np.linspace(-2, 10, 200)[:, np.newaxis]
+for lower, upper in [(-12, -4), (-4, 0), (0, 4), (4, 8), (8, 16)]:
+    log_xs = np.linspace(lower, upper, 2000)[np.newaxis, :]
+    exact = model_m_from_c(10.0**log_xs, 10.0**log_kms, 1.0)
+    fast = model_m_from_c_fast(10.0**log_xs, 10.0**log_kms, 1.0)
+    error = np.abs(fast / exact - 1)
+    print(
+        "%-22s %12.1e %12.1e"
+        % ("%g to %g" % (lower, upper), np.median(error), np.max(error))
+    )
+
+# Speed, at random points covering the same ranges
+rng = np.random.default_rng(0)
+ka = 10 ** rng.uniform(0, 16, args.n)
+km = 10 ** rng.uniform(-2, 10, args.n)
+c = 10 ** rng.uniform(-12, 0, args.n)
+logcyt_l109r = [np.log10(c), rng.integers(0, 2, args.n)]
+
+print("\nSpeed (%d points)" % args.n)
+print("%-22s %12s %12s %10s" % ("Function", "full", "fast", "speedup"))
+for name, func in [
+    ("model_m_from_c", lambda fast: model_m_from_c(ka, km, c, fast=fast)),
+    ("jac_m_from_c", lambda fast: jac_m_from_c(ka, km, c, fast=fast)),
+    (
+        "model_log_paired",
+        lambda fast: model_log_paired(logcyt_l109r, 8.0, 6.0, 4.0, fast=fast),
+    ),
+]:
+    t_full = mean_time(lambda: func(False), args.repeat)
+    t_fast = mean_time(lambda: func(True), args.repeat)
+    print(
+        "%-22s %10.2fms %10.2fms %9.1fx"
+        % (name, t_full * 1e3, t_fast * 1e3, t_full / t_fast)
+    )
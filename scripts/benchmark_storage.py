@@ -0,0 +1,55 @@
+# python benchmark_storage.py [--repeat N]
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from src.storage import read_quantification
+
+# Quantification tables to benchmark
+files = [
+    "../data/ph_quantification.csv",
+    "../data/ring_ph_quantification.csv",
+    "../data/ring_ph_quantification_no_pb.csv",
+]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--repeat", type=int, default=20, help="number of loads to average")
+args = parser.parse_args()
+
+
+def mean_time(func, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start_time) / repeat
+
+
+print(
+    "%-40s %12s %12s %12s %10s"
+    % ("File", "read_csv", "columnar", "to_frame", "speedup")
+)
+with tempfile.TemporaryDirectory() as tmp:
+    for f in files:
+        # Work on a copy, so the columnar version isn't saved in data/
+        path = os.path.join(tmp, os.path.basename(f))
+        shutil.copy(f, path)
+        read_quantification(path)
+
+        t_csv = mean_time(lambda: pd.read_csv(path), args.repeat)
+        t_columnar = mean_time(lambda: read_quantification(path), args.repeat)
+        t_frame = mean_time(lambda: read_quantification(path).to_frame(), args.repeat)
+        print(
+            "%-40s %10.2fms %10.2fms %10.2fms %9.1fx"
+            % (
+                os.path.basename(f),
+                t_csv * 1e3,
+                t_columnar * 1e3,
+                t_frame * 1e3,
+                t_csv / t_columnar,
+            )
+        )
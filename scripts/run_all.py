@@ -1,14 +1,52 @@
-# PYDEVD_DISABLE_FILE_VALIDATION=1 python run_all.py
+# PYDEVD_DISABLE_FILE_VALIDATION=1 python run_all.py [--workers N] [--incremental]
+#     [--dry-run] [--profile FILE]
 
+import argparse
 import glob
+import json
 import os
 import time
 
-import nbformat
-from nbconvert.preprocessors import ExecutePreprocessor
-from nbconvert.preprocessors.execute import CellExecutionError
-
 from src import direcslist
+from src.pipeline import (
+    build_graph,
+    load_manifest,
+    notebook_record,
+    plan,
+    print_plan,
+    print_report,
+    run_pipeline,
+    save_manifest,
+)
+
+# Reuse bootstrap fit results from previous runs if the data hasn't changed
+# (see src/cache.py)
+os.environ.setdefault("SRC_FIT_CACHE", os.path.abspath("../.cache/fits"))
+
+# Record of previous runs, for incremental mode
+manifest_path = "../.cache/run_manifest.json"
+
+# Options
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--workers", type=int, default=1, help="number of notebooks to run at once"
+)
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="only run notebooks whose inputs have changed since the last run",
+)
+parser.add_argument(
+    "--dry-run",
+    action="store_true",
+    help="show which notebooks would run in incremental mode, and why",
+)
+parser.add_argument(
+    "--profile",
+    metavar="FILE",
+    help="profile cells and src functions, and save results to FILE (JSON)",
+)
+args = parser.parse_args()
 
 # Gather file list
 file_list1 = sorted(glob.glob("Run/*.ipynb"))
@@ -19,33 +57,45 @@ for p in direcslist("Analysis"):
 file_list2 = sorted(file_list2)
 file_list = file_list1 + file_list2
 
+# Work out which notebooks depend on files written by others
+graph = build_graph(file_list)
+
+# Work out which notebooks need to run
+manifest = load_manifest(manifest_path)
+if args.incremental or args.dry_run:
+    reasons = plan(file_list, graph, manifest)
+    print_plan(reasons)
+    if args.dry_run:
+        raise SystemExit
+    file_list = [f for f in file_list if reasons[f]]
+
+
+# Record successful runs as they finish
+def record(nb, result):
+    if result["status"] == "ok":
+        manifest[nb] = notebook_record(nb)
+    else:
+        manifest.pop(nb, None)
+    save_manifest(manifest, manifest_path)
+
+
 # Start timer
 start_time = time.time()
 
 # Execute notebooks and save output
-num_notebooks = len(file_list)
-for i, f in enumerate(file_list):
-    run_path = os.path.dirname(f)
-    with open(f) as file:
-        nb = nbformat.read(file, as_version=4)
-        ep = ExecutePreprocessor(kernel_name="python3")
-        try:
-            print("Running", f, ":", i + 1, "/", num_notebooks)
-            out = ep.preprocess(nb, {"metadata": {"path": run_path}})
-        except CellExecutionError:
-            out = None
-            msg = 'Error executing the notebook "%s".\n' % f
-            print(msg)
-        except TimeoutError:
-            msg = 'Timeout executing the notebook "%s".\n' % f
-            print(msg)
-        finally:
-            # Save output
-            nbformat.write(nb, f)
+results = run_pipeline(
+    file_list,
+    workers=args.workers,
+    graph=graph,
+    callback=record,
+    profile=args.profile is not None,
+)
 
 # Time elapsed
 elapsed_time = time.time() - start_time
-print(
-    "Finished! (%s minutes, %s seconds)"
-    % (int(elapsed_time // 60), int(elapsed_time % 60))
-)
+print_report(results, graph, elapsed_time)
+
+# Save profile
+if args.profile:
+    with open(args.profile, "w") as f:
+        json.dump({"wall_time": elapsed_time, "notebooks": results}, f, indent=1)
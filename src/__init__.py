@@ -1,39 +1,92 @@
-# Image analysis functions
-from par_segmentation import (  # noqa
-    interp_1d_array,
-    load_image,
-    rotated_embryo,
-    bounded_mean_1d,
-    direcslist,
-    straighten,
-    bounded_mean_2d,
-    error_func,
-    gaus,
-    dosage,
-    save_img,
-)
-from par_segmentation.model_flexi import ImageQuant2  # noqa
-
-# Helper functions
-from .helpers import (  # noqa
-    nb_setup,
-    raw_data_path,
-    fold,
-)
-
-# Plotting functions
-from .plottling import (  # noqa
-    dataplot,
-    lighten,
-    fake_log,
-    minor_ticks,
-    random_grouped_scatter,
-    log_molar_to_micromolar,
-)
-
-# Model fitting functions
-from .dimer_model_fit import EnergiesConfidenceIntervalPaired  # noqa
-from .rundowns_regression import ExponentConfidenceInterval  # noqa
-
-# Statistics functions
-from .stats import bootstrap, bootstrap_effect_size_pd, add_stats_table_row  # noqa
+import importlib
+import random
+
+import numpy as np
+
+# Seed at import, as before (nb_setup also does this)
+random.seed(12345)
+np.random.seed(12345)
+
+"""
+Public names
+
+Names are loaded from their modules on first use (e.g. `from src import bootstrap` only
+imports src.stats), so notebooks and worker processes don't pay for par_segmentation,
+matplotlib, seaborn or scipy unless they use them.
+
+"""
+
+_exports = {
+    # Image analysis functions
+    "interp_1d_array": "par_segmentation",
+    "load_image": "par_segmentation",
+    "rotated_embryo": "par_segmentation",
+    "bounded_mean_1d": "par_segmentation",
+    "direcslist": "par_segmentation",
+    "straighten": "par_segmentation",
+    "bounded_mean_2d": "par_segmentation",
+    "error_func": "par_segmentation",
+    "gaus": "par_segmentation",
+    "dosage": "par_segmentation",
+    "save_img": "par_segmentation",
+    "ImageQuant2": "par_segmentation.model_flexi",
+    "load_embryos": ".quantification",
+    "iter_embryos": ".quantification",
+    "quantify_sharded": ".quantification",
+    "quantify_manifest": ".quantification",
+    # Data storage
+    "QuantificationTable": ".storage",
+    "read_quantification": ".storage",
+    "save_table": ".storage",
+    "load_table": ".storage",
+    # Summary statistics
+    "summarise_quantification": ".summary",
+    "dense_profiles": ".summary",
+    "bounded_means": ".summary",
+    "peak_window_means": ".summary",
+    # Helper functions
+    "nb_setup": ".helpers",
+    "raw_data_path": ".helpers",
+    # Profile transforms
+    "fold": ".profiles",
+    "resample": ".profiles",
+    "normalise": ".profiles",
+    "window_mean": ".profiles",
+    "anterior_posterior": ".profiles",
+    # Plotting functions
+    "dataplot": ".plottling",
+    "lighten": ".plottling",
+    "fake_log": ".plottling",
+    "minor_ticks": ".plottling",
+    "random_grouped_scatter": ".plottling",
+    "log_molar_to_micromolar": ".plottling",
+    "beeswarm": ".swarm",
+    # Figure export
+    "export_figure": ".figures",
+    "export_report": ".figures",
+    # Model fitting functions
+    "EnergiesConfidenceIntervalPaired": ".dimer_model_fit",
+    "ExponentConfidenceInterval": ".rundowns_regression",
+    "ThreeCompartmentModel": ".three_compartment",
+    "ResultCache": ".cache",
+    # Statistics functions
+    "bootstrap": ".stats",
+    "bootstrap_effect_size_pd": ".stats",
+    "bootstrap_effect_sizes_pd": ".stats",
+    "add_stats_table_row": ".stats",
+    "StatsTable": ".stats",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
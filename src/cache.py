@@ -0,0 +1,175 @@
+import hashlib
+import os
+import sys
+import tempfile
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+"""
+Persistent cache for expensive fit results
+
+"""
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of numpy arrays, stored as compressed .npz files.
+
+    Entries are keyed by a hash of the inputs (see ResultCache.key). When the total size
+    of the cache exceeds max_bytes, the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 500 * 1024**2):
+        """
+        Args:
+            directory (str): folder to store cache entries in (created if needed)
+            max_bytes (int, optional): maximum total size of the cache. Defaults to
+                500 MB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(**parts) -> str:
+        """
+        Hashes arrays and options into a cache key.
+
+        Arrays are hashed by dtype, shape and contents; other values by their repr.
+
+        Returns:
+            str: hex digest
+        """
+        h = hashlib.sha256()
+        for name in sorted(parts):
+            value = parts[name]
+            h.update(name.encode())
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                h.update(str((value.dtype.str, value.shape)).encode())
+                h.update(value.tobytes())
+            else:
+                h.update(repr(value).encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        Loads an entry, marking it as recently used.
+
+        Returns:
+            dict: arrays stored under key, or None if not in the cache
+        """
+        path = self.path(key)
+        try:
+            with np.load(path) as f:
+                arrays = {name: f[name] for name in f.files}
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        os.utime(path)
+        return arrays
+
+    def save(self, key: str, **arrays):
+        """
+        Saves arrays under key, then evicts old entries if the cache is over max_bytes.
+        """
+        # Write to a temporary file and rename, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        Deletes one entry, or the whole cache if key is None.
+        """
+        keys = [key] if key is not None else [e[0] for e in self.entries()]
+        for k in keys:
+            try:
+                os.remove(self.path(k))
+            except FileNotFoundError:
+                pass
+
+    def entries(self) -> list:
+        """
+        Returns:
+            list: (key, size in bytes, last used time) for each entry, least recently
+                used first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((name[:-4], stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache is within max_bytes.
+        """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self.invalidate(key)
+            total -= size
+
+
+def get_cache(cache=None) -> Optional[ResultCache]:
+    """
+    Resolves the cache argument of the fitting classes.
+
+    Args:
+        cache (ResultCache, str or bool, optional): a ResultCache, a directory, True for
+            the default directory, or False for no caching. If None (default), the cache
+            directory is taken from the SRC_FIT_CACHE environment variable if it is set.
+
+    Returns:
+        ResultCache: or None if caching is disabled
+    """
+    if cache is None:
+        cache = os.environ.get("SRC_FIT_CACHE") or False
+    if cache is True:
+        cache = default_cache_path
+    if cache is False:
+        return None
+    if isinstance(cache, str):
+        return ResultCache(cache)
+    return cache
+
+
+@lru_cache(maxsize=None)
+def source_hash(*modules: str) -> str:
+    """
+    Hashes the source code of modules, for cache keys, so that results computed by a
+    different version of the code are not reused.
+
+    Args:
+        *modules (str): names of imported modules
+
+    Returns:
+        str: hex digest
+    """
+    h = hashlib.sha256()
+    for module in modules:
+        with open(sys.modules[module].__file__, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+default_cache_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "../.cache/fits/"
+)
@@ -1,5 +1,14 @@
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import cached_property
+
 import numpy as np
+import pandas as pd
 from scipy.optimize import curve_fit
+from scipy.stats import chi2, norm
+
+from .cache import ResultCache, get_cache, source_hash
+from .stats import bootstrap_indices, chunked_percentile
 
 """
 Model
@@ -7,8 +16,10 @@ Model
 """
 
 
-def model_m_from_c(ka, km, c):
+def model_m_from_c(ka, km, c, fast=False):
     # See notebook 'Dimer model solving'
+    if fast:
+        return model_m_from_c_fast(ka, km, c)
     return (
         c
         * km
@@ -34,50 +45,60 @@ def model_m_from_c(ka, km, c):
     )
 
 
+def model_m_from_c_fast(ka, km, c):
+    """
+    Reduced form of model_m_from_c, about three times faster.
+
+    With x = c * ka and a = 4x + 1 + sqrt(8x + 1), the denominator of model_m_from_c is
+    a^2 / 2 and the square root in the numerator is a^(3/2) / sqrt(2), so the expression
+    reduces exactly to c * km * (4 x km / a + sqrt(2 / a)), with two square roots in
+    place of five. Agrees with model_m_from_c to within floating point rounding
+    (relative error ~1e-15, see scripts/benchmark_model.py).
+    """
+    x = c * ka
+    a = 4 * x + 1 + np.sqrt(8 * x + 1)
+    return c * km * (4 * x * km / a + np.sqrt(2 / a))
+
+
 # Note: from here on ka and km are expressed in log10 format
+# Parameters may be scalars, or (n, 1) arrays to evaluate n parameter sets at once
 
 
-def model_unpaired(cyt, ka, km):
+def model_unpaired(cyt, ka, km, *, fast=False):
     c1 = cyt
-    m1 = model_m_from_c(10**ka, 10**km, c1)
+    m1 = model_m_from_c(10**ka, 10**km, c1, fast=fast)
     return m1
 
 
-def model_unpaired_log(logcyt, ka, km):
+def model_unpaired_log(logcyt, ka, km, *, fast=False):
     c1 = 10**logcyt
-    m1 = model_m_from_c(10**ka, 10**km, c1)
+    m1 = model_m_from_c(10**ka, 10**km, c1, fast=fast)
     return np.log10(m1)
 
 
-def model_paired(cyt_l109r, ka1, ka2, km):
+def model_paired(cyt_l109r, ka1, ka2, km, *, fast=False):
     cyt, l109r = cyt_l109r
-    ka = (ka1 * np.array([l109r == 0])).flatten() + (
-        ka2 * np.array([l109r == 1])
-    ).flatten()
+    ka = np.where(l109r == 0, ka1, ka2)
     c1 = cyt
-    m1 = model_m_from_c(10**ka, 10**km, c1)
+    m1 = model_m_from_c(10**ka, 10**km, c1, fast=fast)
     return m1
 
 
-def model_log_paired(logcyt_l109r, ka1, ka2, km):
+def model_log_paired(logcyt_l109r, ka1, ka2, km, *, fast=False):
     logcyt, l109r = logcyt_l109r
     cyt = 10**logcyt
     c1 = cyt
-    ka = (ka1 * np.array([l109r == 0])).flatten() + (
-        ka2 * np.array([l109r == 1])
-    ).flatten()
-    m1 = model_m_from_c(10**ka, 10**km, c1)
+    ka = np.where(l109r == 0, ka1, ka2)
+    m1 = model_m_from_c(10**ka, 10**km, c1, fast=fast)
     return np.log10(m1)
 
 
-def model_log_paired_D(logcyt_l109r, ka1, ka2, km, D):
+def model_log_paired_D(logcyt_l109r, ka1, ka2, km, D, *, fast=False):
     logcyt, l109r = logcyt_l109r
     cyt = 10**logcyt
     c1 = cyt
-    ka = (ka1 * np.array([l109r == 0])).flatten() + (
-        ka2 * np.array([l109r == 1])
-    ).flatten()
-    m1 = model_m_from_c(10**ka, 10**km, c1)
+    ka = np.where(l109r == 0, ka1, ka2)
+    m1 = model_m_from_c(10**ka, 10**km, c1, fast=fast)
     return np.log10(m1) * (10**D)
 
 
@@ -89,14 +110,264 @@ def dimer_fraction(conc, ka):
     return 1 - (((np.sqrt(4 * conc * (10**ka) + 1) - 1) / (2 * (10**ka))) / conc)
 
 
+"""
+Jacobians
+
+"""
+
+
+def jac_m_from_c(ka, km, c, fast=False):
+    """
+    Closed-form partial derivatives of model_m_from_c with respect to ka and km.
+
+    Args:
+        ka (np.array): Dimerisation association constant (linear units)
+        km (np.array): Membrane association constant (linear units)
+        c (np.array): Cytoplasmic concentration
+        fast (bool, optional): Differentiate the reduced form (model_m_from_c_fast).
+            Defaults to False.
+
+    Returns:
+        tuple: dm/dka and dm/dkm
+    """
+    if fast:
+        # Write m = c * km * (4 * x * km / a + sqrt(2 / a)), with x = c * ka
+        x = c * ka
+        s = np.sqrt(8 * x + 1)
+        a = 4 * x + 1 + s
+        da = 4 + 4 / s
+        r = np.sqrt(2 / a)
+        dm_dx = c * km * (4 * km * (a - x * da) / a**2 - 0.5 * r * da / a)
+        return c * dm_dx, c * (8 * x * km / a + r)
+
+    # Write m = c * km * (2 * x * km * a + b) / d, with x = c * ka
+    x = c * ka
+    s = np.sqrt(8 * x + 1)
+    ds = 4 / s
+    a = 4 * x + s + 1
+    b = np.sqrt(32 * x**3 + 24 * x**2 * s + 72 * x**2 + 16 * x * s + 24 * x + 2 * s + 2)
+    db = (
+        96 * x**2
+        + 48 * x * s
+        + 24 * x**2 * ds
+        + 144 * x
+        + 16 * s
+        + 16 * x * ds
+        + 24
+        + 2 * ds
+    ) / (2 * b)
+    d = 8 * x**2 + 4 * x * s + 8 * x + s + 1
+    dd = 16 * x + 4 * s + 4 * x * ds + 8 + ds
+    n = 2 * x * km * a + b
+    dn = 2 * km * (a + x * (4 + ds)) + db
+
+    # Chain rule through x for ka, direct for km
+    dm_dx = c * km * (dn * d - n * dd) / d**2
+    return c * dm_dx, c * (4 * x * km * a + b) / d
+
+
+# Jacobians of the paired models with respect to (ka1, ka2, km[, D]), in log10 format
+
+
+def _jac_paired(cyt, l109r, ka1, ka2, km, fast=False):
+    ka = np.where(l109r == 0, ka1, ka2)
+    m = model_m_from_c(10**ka, 10**km, cyt, fast=fast)
+    dm_dka, dm_dkm = jac_m_from_c(10**ka, 10**km, cyt, fast=fast)
+    dm_dka = dm_dka * np.log(10) * 10**ka
+    dm_dkm = dm_dkm * np.log(10) * 10**km
+    return m, np.c_[dm_dka * (l109r == 0), dm_dka * (l109r == 1), dm_dkm]
+
+
+def jac_paired(cyt_l109r, ka1, ka2, km, *, fast=False):
+    cyt, l109r = cyt_l109r
+    return _jac_paired(cyt, l109r, ka1, ka2, km, fast)[1]
+
+
+def jac_log_paired(logcyt_l109r, ka1, ka2, km, *, fast=False):
+    logcyt, l109r = logcyt_l109r
+    m, jac = _jac_paired(10**logcyt, l109r, ka1, ka2, km, fast)
+    return jac / (m[:, None] * np.log(10))
+
+
+def jac_log_paired_D(logcyt_l109r, ka1, ka2, km, D, *, fast=False):
+    logcyt, l109r = logcyt_l109r
+    m, jac = _jac_paired(10**logcyt, l109r, ka1, ka2, km, fast)
+    return np.c_[
+        jac * (10**D) / (m[:, None] * np.log(10)),
+        np.log10(m) * (10**D) * np.log(10),
+    ]
+
+
+jacobians = {
+    model_paired: jac_paired,
+    model_log_paired: jac_log_paired,
+    model_log_paired_D: jac_log_paired_D,
+}
+
+
 """
 Fitting
 
 """
 
 
+def fit_paired(cyt_l109r, mem, model, p0, bounds, fast_fit=False, fast_model=False):
+    """
+    Fits a paired model to the data.
+
+    If fast_fit is set, curve_fit is given the closed-form Jacobian of the model rather
+    than estimating it by finite differences.
+
+    Args:
+        cyt_l109r (list): Cytoplasmic concentrations and L109R genotype
+        mem (np.array): Membrane concentrations
+        model (function): The model (model_paired, model_log_paired or
+            model_log_paired_D)
+        p0 (list): The initial guess for the parameters
+        bounds (list): The lower and upper bounds for the parameters
+        fast_fit (bool, optional): Use the analytic Jacobian. Defaults to False.
+        fast_model (bool, optional): Use the reduced model kernel. Defaults to False.
+
+    Returns:
+        params (np.array): The parameters of the fitted model.
+        counts (np.array): Fit counts (see counted_curve_fit)
+    """
+
+    def jac(x, *p):
+        return jacobians[model](x, *p, fast=fast_model)
+
+    return counted_curve_fit(
+        lambda x, *p: model(x, *p, fast=fast_model),
+        jac if fast_fit else None,
+        np.array(cyt_l109r),
+        mem,
+        p0=p0,
+        bounds=bounds,
+    )
+
+
+def counted_curve_fit(f, jac, xdata, ydata, p0, bounds=(-np.inf, np.inf)):
+    """
+    curve_fit, counting evaluations of the model and its Jacobian.
+
+    Args:
+        f (function): The model, f(xdata, *params)
+        jac (function): Its Jacobian, jac(xdata, *params), or None to estimate it by
+            finite differences
+        xdata (np.array): Independent variables
+        ydata (np.array): Data
+        p0 (list): The initial guess for the parameters
+        bounds (list, optional): The lower and upper bounds for the parameters. Defaults
+            to no bounds.
+
+    Returns:
+        params (np.array): The fitted parameters.
+        counts (np.array): Model evaluations (including those used for finite difference
+            Jacobians), Jacobian evaluations (one per optimizer iteration: analytic if
+            jac is given, otherwise finite difference sweeps) and the function
+            evaluations reported by the optimizer (nfev, which excludes finite
+            difference evaluations if the problem has bounds, i.e. a parameter is
+            fixed).
+    """
+    counts = np.zeros(3, dtype=int)
+    sweep = {"base": None, "k": 0}
+
+    def _f(x, *p):
+        counts[0] += 1
+        if jac is None:
+            # A finite difference Jacobian perturbs each parameter of the current point
+            # in turn, so count sweeps of calls that each change only the next parameter
+            changed = np.flatnonzero(np.not_equal(p, sweep["base"]))
+            if sweep["base"] is not None and changed.tolist() == [sweep["k"]]:
+                sweep["k"] += 1
+                if sweep["k"] == len(p):
+                    counts[1] += 1
+                    sweep["base"] = None
+            else:
+                sweep["base"], sweep["k"] = np.array(p), 0
+        return f(x, *p)
+
+    def _jac(*args):
+        counts[1] += 1
+        return jac(*args)
+
+    popt, _, infodict, _, _ = curve_fit(
+        _f,
+        xdata,
+        ydata,
+        maxfev=10000000,
+        p0=p0,
+        bounds=bounds,
+        jac=None if jac is None else _jac,
+        full_output=True,
+    )
+    counts[2] = infodict["nfev"]
+    return popt, counts
+
+
+def paired_indices(l109r, rng):
+    """
+    Draws bootstrap indices for each genotype.
+
+    Args:
+        l109r (np.array): L109R genotype (0 or 1) of each embryo
+        rng (np.random.Generator): Random number generator
+
+    Returns:
+        list: Indices into the data of each genotype
+    """
+    return [rng.integers(0, n, n) for n in (np.sum(l109r == j) for j in range(2))]
+
+
+def resample_paired(cyts_l109r, mems, inds):
+    """
+    Generates a bootstrap sample, resampling each genotype separately.
+
+    Args:
+        cyts_l109r (list): Cytoplasmic concentrations and L109R genotype
+        mems (np.array): Membrane concentrations
+        inds (list): Indices to draw from the data of each genotype (see paired_indices)
+
+    Returns:
+        list: Resampled cytoplasmic concentrations and L109R genotype
+        np.array: Resampled membrane concentrations
+    """
+    # Split the input list into cytoplasmic concentrations and L109R genotype
+    cyts, l109r = cyts_l109r
+
+    # Initialize lists to store the bootstrap samples
+    _cyts, _mems, _l109r = [], [], []
+
+    # Generate a bootstrap sample for each genotype
+    for j in range(2):
+        # Select the data for the current genotype
+        __cyts = cyts[l109r == j]
+        __mems = mems[l109r == j]
+
+        # Select data with replacement
+        _cyts.append(__cyts[inds[j]])
+        _mems.append(__mems[inds[j]])
+        _l109r.append(np.full(len(inds[j]), j))
+
+    # Compile the bootstrap samples into arrays
+    return [np.concatenate(_cyts), np.concatenate(_l109r)], np.concatenate(_mems)
+
+
 class EnergiesConfidenceIntervalPaired:
-    """A class used to calculate the confidence interval of energy levels in a paired system."""
+    """
+    A class used to calculate the confidence interval of energy levels in a paired
+    system.
+
+    Results are computed lazily and cached: the full-data fit (e.g. ka_full, res_y) on
+    first access, and the bootstrap (e.g. kas, all_fits_lower) only when a confidence
+    interval is read. Changing n_bootstrap reuses existing bootstrap samples (extending
+    or truncating them), and changing interval only recomputes the percentiles.
+
+    With ci_method="profile", confidence intervals come from the profile likelihood of
+    each parameter and bands from the delta method instead, which takes a few dozen fits
+    rather than n_bootstrap (see profile_likelihood). ci_table reports both side by
+    side.
+    """
 
     def __init__(
         self,
@@ -107,6 +378,17 @@ class EnergiesConfidenceIntervalPaired:
         fix_wt=False,
         fix_mut=False,
         fit_D=False,
+        n_workers=1,
+        chunk_size=100,
+        seed=None,
+        fast_fit=False,
+        fast_model=False,
+        n_bootstrap=10000,
+        n_x=100,
+        interval=95,
+        stream_chunk_size=None,
+        cache=None,
+        ci_method="bootstrap",
     ):
         """
         Initializes the class with the given parameters and data.
@@ -119,6 +401,39 @@ class EnergiesConfidenceIntervalPaired:
             fix_wt (bool, optional): A flag to determine if the wild type dimer enenrgy should be fixed. Defaults to False.
             fix_mut (bool, optional): A flag to determine if the mutant dimer energy should be fixed. Defaults to False.
             fit_D (bool, optional): A flag to determine if the D parameter should be fit. Defaults to False.
+            n_workers (int, optional): The number of worker processes used for bootstrap
+                fitting. Defaults to 1.
+            chunk_size (int, optional): The number of bootstrap samples sent to a worker
+                at a time. Defaults to 100.
+            seed (int, optional): Seed for the bootstrap random number generators. If
+                None, bootstrap samples are drawn from the global numpy random state as
+                in earlier versions (which bootstrapped on initialisation), so results
+                match those: the state is copied here, and the global state is moved
+                past the draws for n_bootstrap samples. Defaults to None.
+            fast_fit (bool, optional): A flag to use the analytic Jacobian for fitting,
+                and warm start bootstrap fits from the full-data optimum. Estimates
+                agree with the default path to within 1e-3 (log10 units), which is
+                within the convergence tolerance of either path. Defaults to False.
+            fast_model (bool, optional): A flag to evaluate the model (and its Jacobian)
+                with the reduced kernel model_m_from_c_fast, which agrees with the full
+                expression to within rounding. Defaults to False.
+            n_bootstrap (int, optional): The number of bootstrap samples to generate.
+                Defaults to 10000.
+            n_x (int, optional): The number of points to generate for the x-axis of the
+                result plots. Defaults to 100.
+            interval (int, optional): The confidence interval for the bootstrap
+                estimates. Defaults to 95.
+            stream_chunk_size (int, optional): If given, confidence intervals are
+                computed from chunks of this many bootstrap samples at a time, without
+                storing all bootstrap curves. Defaults to None.
+            cache (ResultCache, str or bool, optional): On-disk cache for bootstrap
+                results, keyed by the data, fit options, n_bootstrap and seed (see
+                get_cache). Defaults to None.
+            ci_method (str, optional): How the confidence bands (all_fits_lower etc.)
+                are computed. "bootstrap" for percentiles across bootstrap fits, or
+                "profile" for the delta method, with dimer fraction bands from the
+                profile likelihood intervals of ka (see profile_likelihood). Defaults to
+                "bootstrap".
         """
 
         # Import data
@@ -140,6 +455,17 @@ class EnergiesConfidenceIntervalPaired:
         self.fix_wt = fix_wt
         self.fix_mut = fix_mut
         self.fit_D = fit_D
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.fast_fit = fast_fit
+        self.fast_model = fast_model
+        self.stream_chunk_size = stream_chunk_size
+        self.cache = get_cache(cache)
+        self._n_bootstrap = n_bootstrap
+        self._n_x = n_x
+        self._interval = interval
+        self._ci_method = ci_method
 
         # Model
         if self.log:
@@ -147,125 +473,547 @@ class EnergiesConfidenceIntervalPaired:
         else:
             self.model = model_paired
 
-        # Output
-        self.res_x = [None, None]
-        self.res_y = [None, None]
-        self.ka_full = [None, None]
-        self.km_full = None
-        self.kas = [None, None]
-        self.kms = None
-        self.all_fits_lower = [None, None]
-        self.all_fits_upper = [None, None]
-        self.cyt_dim = [None, None]
-        self.mem_dim = [None, None]
-        self.cyt_dim_lower = [None, None]
-        self.cyt_dim_upper = [None, None]
-        self.mem_dim_lower = [None, None]
-        self.mem_dim_upper = [None, None]
-
-        # Run
+        # Without a seed, continue the global random state, leaving it as bootstrapping
+        # n_bootstrap samples on initialisation did
+        if seed is None:
+            self._global_state = np.random.get_state()
+            bootstrap_indices(self._groups(), niter=n_bootstrap)
+
+        # Bootstrap samples (extended on demand)
+        self.reset()
         self.p0_curve_fit, self.bounds_curve_fit = self.setup_curve_fit()
-        self.run()
 
-    def run(self, n_bootstrap=10000, n_x=100, interval=95):
+    def run(self, n_bootstrap=10000, n_x=100, interval=95, stream_chunk_size=None):
         """
-        Executes the model fitting and bootstrapping process.
+        Executes the model fitting and bootstrapping process, discarding any cached
+        results.
 
         Args:
             n_bootstrap (int, optional): The number of bootstrap samples to generate. Defaults to 10000.
             n_x (int, optional): The number of points to generate for the x-axis of the result plots. Defaults to 100.
             interval (int, optional): The confidence interval for the bootstrap estimates. Defaults to 95.
+            stream_chunk_size (int, optional): If given, confidence intervals are
+                computed from chunks of this many bootstrap samples at a time, without
+                storing all bootstrap curves. Defaults to None.
         """
+        self.reset()
+        self.n_bootstrap, self.n_x, self.interval = n_bootstrap, n_x, interval
+        self.stream_chunk_size = stream_chunk_size
+        self._bands
+
+    def reset(self):
+        """
+        Discards all cached results, including bootstrap samples.
+        """
+        self._clear(
+            "popt_full",
+            "res_x",
+            "res_y",
+            "cyt_dim",
+            "mem_dim",
+            "_bands",
+            "rss_full",
+            "covariance",
+            "_profiles",
+        )
+        if self.seed is None:
+            self._rng = np.random.RandomState()
+            self._rng.set_state(self._global_state)
+        else:
+            self._seed_sequence = np.random.SeedSequence(self.seed)
+        self._params = None
+        self._fit_counts = None
+
+    def _clear(self, *names):
+        # Remove cached properties so that they are recomputed on next access
+        for name in names:
+            self.__dict__.pop(name, None)
+
+    # Settings
+
+    @property
+    def n_bootstrap(self):
+        return self._n_bootstrap
+
+    @n_bootstrap.setter
+    def n_bootstrap(self, value):
+        self._n_bootstrap = value
+        self._clear("_bands")
+
+    @property
+    def n_x(self):
+        return self._n_x
+
+    @n_x.setter
+    def n_x(self, value):
+        self._n_x = value
+        self._clear("res_x", "res_y", "cyt_dim", "mem_dim", "_bands")
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @interval.setter
+    def interval(self, value):
+        self._interval = value
+        self._clear("_bands", "_profiles")
+
+    @property
+    def ci_method(self):
+        return self._ci_method
+
+    @ci_method.setter
+    def ci_method(self, value):
+        self._ci_method = value
+        self._clear("_bands")
+
+    # Full dataset
+
+    @cached_property
+    def popt_full(self):
         # Fit the model to the full dataset
         popt_full = self.single_fit([self.cyts, self.l109r], self.mems)
 
+        # If fit_D is True, print D
+        if self.fit_D:
+            print(popt_full[3])
+        return popt_full
+
+    @property
+    def ka_full(self):
+        return [self.popt_full[0], self.popt_full[1]]
+
+    @property
+    def km_full(self):
+        return self.popt_full[2]
+
+    @cached_property
+    def res_x(self):
         # Generate x-axis points for the plots
-        self.res_x = [
+        return [
             np.linspace(
                 np.min(self.cyts[self.l109r == i]),
                 np.max(self.cyts[self.l109r == i]),
-                n_x,
+                self.n_x,
             )
             for i in range(2)
         ]
 
+    @cached_property
+    def res_y(self):
         # Calculate the model predictions for the plots
-        self.res_y = [
+        return [
             self.model(
                 [
                     self.res_x[i],
                     np.ones(len(self.res_x[i])) if i else np.zeros(len(self.res_x[i])),
                 ],
-                *popt_full,
+                *self.popt_full,
+                fast=self.fast_model,
             )
             for i in range(2)
         ]
 
-        # Extract the fitted parameters
-        self.ka_full = [popt_full[0], popt_full[1]]
-        self.km_full = popt_full[2]
-
-        # If fit_D is True, print D
-        if self.fit_D:
-            print(popt_full[3])
-
-        # Calculate the dimer fractions for each genotype
-        for i in range(2):
-            self.cyt_dim[i] = 100 * dimer_fraction(
+    @cached_property
+    def cyt_dim(self):
+        # Calculate the cytoplasmic dimer fractions for each genotype
+        return [
+            100
+            * dimer_fraction(
                 10 ** self.res_x[i] if self.log else self.res_x[i], self.ka_full[i]
             )
-            self.mem_dim[i] = 100 * dimer_fraction(
+            for i in range(2)
+        ]
+
+    @cached_property
+    def mem_dim(self):
+        # Calculate the membrane dimer fractions for each genotype
+        return [
+            100
+            * dimer_fraction(
                 10 ** self.res_y[i] if self.log else self.res_y[i], self.ka_full[i]
             )
+            for i in range(2)
+        ]
 
-        # Perform bootstrapping to estimate the parameters
-        params = self.bootstrap_fitting([self.cyts, self.l109r], self.mems)
-        self.kas = [params[:, 0], params[:, 1]]
-        self.kms = params[:, 2]
-
-        # Initialize arrays to store the bootstrap estimates
-        all_fits = [np.zeros([n_bootstrap, n_x]) for _ in range(2)]
-        all_cyt_dim = [np.zeros([n_bootstrap, n_x]) for _ in range(2)]
-        all_mem_dim = [np.zeros([n_bootstrap, n_x]) for _ in range(2)]
+    # Bootstrap
 
-        # Calculate the model predictions and dimer fractions for each bootstrap sample
-        for j in range(2):
-            for i, p in enumerate(params):
-                all_fits[j][i, :] = self.model(
-                    [
-                        self.res_x[j],
-                        np.ones(len(self.res_x[j]))
-                        if j
-                        else np.zeros(len(self.res_x[j])),
-                    ],
-                    *p,
-                )
-                all_cyt_dim[j][i, :] = 100 * dimer_fraction(
-                    10 ** self.res_x[j] if self.log else self.res_x[j], p[j]
-                )
-                all_mem_dim[j][i, :] = 100 * dimer_fraction(
-                    10 ** self.res_y[j] if self.log else self.res_y[j], p[j]
+    @property
+    def params(self):
+        """
+        Fitted parameters for each bootstrap sample, generating more samples if needed.
+        """
+        # Load from the on-disk cache if possible
+        n_existing = 0 if self._params is None else len(self._params)
+        if n_existing < self.n_bootstrap and self.cache is not None:
+            cached = self.cache.load(self.cache_key())
+            if cached is not None and len(cached["params"]) > n_existing:
+                # Continue the random streams after the loaded samples
+                self._skip(len(cached["params"]) - n_existing)
+                self._params, self._fit_counts = cached["params"], cached["fit_counts"]
+                self.__dict__.setdefault("popt_full", cached["popt_full"])
+                n_existing = len(self._params)
+
+        # Generate missing samples
+        if n_existing < self.n_bootstrap:
+            params, counts = self.bootstrap_fitting(
+                [self.cyts, self.l109r],
+                self.mems,
+                n=self.n_bootstrap - n_existing,
+                full_output=True,
+            )
+            if self._params is not None:
+                params = np.r_[self._params, params]
+                counts = np.r_[self._fit_counts, counts]
+            self._params, self._fit_counts = params, counts
+            if self.cache is not None:
+                self.cache.save(
+                    self.cache_key(),
+                    params=params,
+                    fit_counts=counts,
+                    popt_full=self.popt_full,
                 )
+        return self._params[: self.n_bootstrap]
 
-            # Calculate the lower and upper bounds of the confidence interval for each estimate
-            self.all_fits_lower[j] = np.percentile(
-                all_fits[j], (100 - interval) / 2, axis=0
-            )
-            self.all_fits_upper[j] = np.percentile(
-                all_fits[j], 50 + (interval / 2), axis=0
-            )
-            self.cyt_dim_lower[j] = np.percentile(
-                all_cyt_dim[j], (100 - interval) / 2, axis=0
+    def cache_key(self):
+        """
+        Key for the on-disk cache, from the data, fit options, n_bootstrap, seed and the
+        source code.
+        """
+        return ResultCache.key(
+            name=type(self).__name__,
+            cyts=self.cyts,
+            mems=self.mems,
+            l109r=self.l109r,
+            log=self.log,
+            fix_wt=self.fix_wt,
+            fix_mut=self.fix_mut,
+            fit_D=self.fit_D,
+            fast_fit=self.fast_fit,
+            fast_model=self.fast_model,
+            p0=tuple(float(p) for p in self.p0),
+            n_bootstrap=int(self.n_bootstrap),
+            seed=self._seed_key(),
+            code=source_hash(__name__, bootstrap_indices.__module__),
+        )
+
+    def _skip(self, n):
+        # Move the random streams past n bootstrap samples (e.g. loaded from the cache)
+        if self.seed is None:
+            bootstrap_indices(self._groups(), niter=n, rng=self._rng)
+        else:
+            self._seed_sequence.spawn(n)
+
+    def _seed_key(self):
+        # The seed, or the copied global random state (key and position) if not seeded
+        if self.seed is None:
+            return np.append(self._global_state[1], self._global_state[2])
+        return int(self.seed)
+
+    def _groups(self):
+        # Data of each genotype (resampled separately)
+        return [self.cyts[self.l109r == j] for j in range(2)]
+
+    @property
+    def kas(self):
+        return [self.params[:, 0], self.params[:, 1]]
+
+    @property
+    def kms(self):
+        return self.params[:, 2]
+
+    @property
+    def fit_counts(self):
+        self.params
+        return self._fit_counts[: self.n_bootstrap]
+
+    @cached_property
+    def _bands(self):
+        if self.ci_method == "bootstrap":
+            return self._bootstrap_bands()
+        if self.ci_method == "profile":
+            return self._profile_bands()
+        raise ValueError('ci_method must be "bootstrap" or "profile"')
+
+    def _bootstrap_bands(self):
+        # Calculate the lower and upper bounds of the confidence interval for each
+        # estimate. Model predictions and dimer fractions are evaluated for all
+        # bootstrap samples at once
+        bands = {
+            name: [None, None]
+            for name in [
+                "all_fits_lower",
+                "all_fits_upper",
+                "cyt_dim_lower",
+                "cyt_dim_upper",
+                "mem_dim_lower",
+                "mem_dim_upper",
+            ]
+        }
+        params = self.params
+        q = [(100 - self.interval) / 2, 50 + (self.interval / 2)]
+        for j in range(2):
+            x = [self.res_x[j], np.full(self.n_x, j)]
+            cyt = 10 ** self.res_x[j] if self.log else self.res_x[j]
+            mem = 10 ** self.res_y[j] if self.log else self.res_y[j]
+            bands["all_fits_lower"][j], bands["all_fits_upper"][j] = chunked_percentile(
+                lambda p: self.model(x, *p.T[:, :, None], fast=self.fast_model),
+                params,
+                q,
+                self.stream_chunk_size,
             )
-            self.cyt_dim_upper[j] = np.percentile(
-                all_cyt_dim[j], 50 + (interval / 2), axis=0
+            bands["cyt_dim_lower"][j], bands["cyt_dim_upper"][j] = chunked_percentile(
+                lambda p: 100 * dimer_fraction(cyt, p[:, j, None]),
+                params,
+                q,
+                self.stream_chunk_size,
             )
-            self.mem_dim_lower[j] = np.percentile(
-                all_mem_dim[j], (100 - interval) / 2, axis=0
+            bands["mem_dim_lower"][j], bands["mem_dim_upper"][j] = chunked_percentile(
+                lambda p: 100 * dimer_fraction(mem, p[:, j, None]),
+                params,
+                q,
+                self.stream_chunk_size,
             )
-            self.mem_dim_upper[j] = np.percentile(
-                all_mem_dim[j], 50 + (interval / 2), axis=0
+        return bands
+
+    all_fits_lower = property(lambda self: self._bands["all_fits_lower"])
+    all_fits_upper = property(lambda self: self._bands["all_fits_upper"])
+    cyt_dim_lower = property(lambda self: self._bands["cyt_dim_lower"])
+    cyt_dim_upper = property(lambda self: self._bands["cyt_dim_upper"])
+    mem_dim_lower = property(lambda self: self._bands["mem_dim_lower"])
+    mem_dim_upper = property(lambda self: self._bands["mem_dim_upper"])
+
+    # Profile likelihood
+
+    @property
+    def param_names(self):
+        return ["ka1", "ka2", "km", "D"][: len(self.popt_full)]
+
+    @property
+    def free_params(self):
+        """
+        Indices of the parameters that are fitted (i.e. not fixed with fix_wt or
+        fix_mut).
+        """
+        fixed = [self.fix_wt, self.fix_mut]
+        return [i for i in range(len(self.popt_full)) if i > 1 or not fixed[i]]
+
+    @cached_property
+    def rss_full(self):
+        # Residual sum of squares of the full-data fit
+        fit = self.model([self.cyts, self.l109r], *self.popt_full, fast=self.fast_model)
+        return np.sum((fit - self.mems) ** 2)
+
+    @cached_property
+    def covariance(self):
+        """
+        Asymptotic covariance of the parameters at the full-data optimum, s^2 (J^T J)^-1
+        from the Jacobian J of the model and the residual variance s^2 (zero for fixed
+        parameters).
+        """
+        free = self.free_params
+        jac = jacobians[self.model](
+            [self.cyts, self.l109r], *self.popt_full, fast=self.fast_model
+        )[:, free]
+        s2 = self.rss_full / (len(self.mems) - len(free))
+        covariance = np.zeros((len(self.popt_full), len(self.popt_full)))
+        covariance[np.ix_(free, free)] = s2 * np.linalg.pinv(jac.T @ jac)
+        return covariance
+
+    def profile_likelihood(self, j, max_steps=50, tol=1e-3):
+        """
+        Traces the profile likelihood of parameter j to find its confidence interval.
+
+        The profile is the best fit with parameter j held at a given value, and the
+        statistic n log(RSS / RSS_min) (chi-squared with one degree of freedom, assuming
+        normal errors of constant variance) sets the interval. Starting from the
+        full-data optimum, parameter j is stepped outwards in each direction, re-fitting
+        the other free parameters from the previous step's optimum. Steps start at half
+        the standard error and adapt to the curvature of the profile, so that each
+        raises the root of the statistic (close to linear in the parameter on either
+        side of the optimum) by about a third of its threshold. Once the threshold is
+        crossed, the bound is located by regula falsi.
+
+        Args:
+            j (int): Index of the parameter (0: ka1, 1: ka2, 2: km, 3: D)
+            max_steps (int, optional): The maximum number of steps in each direction. If
+                the statistic doesn't reach the threshold within these, the bound is
+                infinite (with a warning). Defaults to 50.
+            tol (float, optional): Tolerance on the root of the statistic at the
+                interval bounds. Defaults to 1e-3.
+
+        Returns:
+            dict: values (np.array, parameter values, sorted), statistic (np.array,
+                statistic at each value), ci (np.array, lower and upper bounds), fits
+                (int, number of fits) and counts (np.array, fit counts summed over the
+                fits, as in single_fit)
+        """
+        popt = np.array(self.popt_full, dtype=float)
+        root = np.sqrt(chi2.ppf(self.interval / 100, 1))
+        se = np.sqrt(self.covariance[j, j])
+        se = se if np.isfinite(se) and se > 0 else 0.1  # e.g. if J^T J is singular
+        counts = np.zeros(3, dtype=int)
+        points = {popt[j]: 0.0}
+
+        def profile(value, p0):
+            # Root of the statistic at value, and the optimum of the other parameters
+            p, rss, fit_counts = self._profile_fit(j, value, p0)
+            counts[:] += fit_counts
+            statistic = len(self.mems) * np.log(rss / self.rss_full)
+            points[value] = max(statistic, 0) if np.isfinite(statistic) else np.inf
+            return np.sqrt(points[value]), p
+
+        ci = []
+        for direction in (-1, 1):
+            # Step outwards until the threshold is crossed
+            value, r, p = popt[j], 0.0, popt
+            step = direction * se / 2
+            for _ in range(max_steps):
+                r_new, p_new = profile(value + step, p)
+                if r_new >= root:
+                    break
+                gain = max(r_new - r, 1e-12)
+                value, r, p = value + step, r_new, p_new
+                step *= np.clip(root / 3 / gain, 0.5, 2)
+            else:
+                warnings.warn(
+                    "Profile likelihood of %s does not reach the %s%% threshold "
+                    "within %d steps" % (self.param_names[j], self.interval, max_steps)
+                )
+                ci.append(direction * np.inf)
+                continue
+
+            # Locate the crossing between value (below) and value + step (above)
+            bracket = [(value, r, p), (value + step, r_new, p_new)]
+            for _ in range(max_steps):
+                (v0, r0, p0), (v1, r1, _) = bracket
+                if np.isfinite(r1):
+                    v = v0 + (root - r0) / (r1 - r0) * (v1 - v0)
+                else:
+                    v = (v0 + v1) / 2
+                r_v, p_v = profile(v, p0)
+                if abs(r_v - root) < tol:
+                    break
+                bracket[int(r_v >= root)] = (v, r_v, p_v)
+            ci.append(v)
+
+        values = np.array(sorted(points))
+        return {
+            "values": values,
+            "statistic": np.array([points[v] for v in values]),
+            "ci": np.array(ci),
+            "fits": len(points) - 1,
+            "counts": counts,
+        }
+
+    def _profile_fit(self, j, value, p0):
+        """
+        Fits the free parameters other than j to the full dataset, with j held at value.
+
+        Returns:
+            np.array: The parameters (including j)
+            float: The residual sum of squares
+            np.array: Fit counts (see counted_curve_fit)
+        """
+        x = np.array([self.cyts, self.l109r])
+        p = np.array(p0, dtype=float)
+        p[j] = value
+        free = [i for i in self.free_params if i != j]
+
+        def model(_, *q):
+            p[free] = q
+            return self.model(x, *p, fast=self.fast_model)
+
+        def jac(_, *q):
+            p[free] = q
+            return jacobians[self.model](x, *p, fast=self.fast_model)[:, free]
+
+        counts = np.zeros(3, dtype=int)
+        if free:
+            p[free], counts = counted_curve_fit(
+                model, jac if self.fast_fit else None, x, self.mems, p0=p[free]
             )
+        rss = np.sum((self.model(x, *p, fast=self.fast_model) - self.mems) ** 2)
+        return p, rss, counts
+
+    @cached_property
+    def _profiles(self):
+        # Profile likelihood of each free parameter (None for fixed parameters)
+        return [
+            self.profile_likelihood(j) if j in self.free_params else None
+            for j in range(len(self.popt_full))
+        ]
+
+    @property
+    def profile_cis(self):
+        """
+        Profile likelihood confidence interval (lower, upper) of each parameter, as rows
+        in the order of param_names. Fixed parameters have their fixed value as both
+        bounds.
+        """
+        return np.array(
+            [
+                self.popt_full[[j, j]] if profile is None else profile["ci"]
+                for j, profile in enumerate(self._profiles)
+            ]
+        )
+
+    def _profile_bands(self):
+        # Model predictions: delta method, from the covariance of the parameters
+        # Dimer fractions are monotonic in ka, so follow from the profile interval of ka
+        # (an unbounded interval tends to no dimer at -inf and all dimer at +inf)
+        bands = {}
+        z = norm.ppf(0.5 + self.interval / 200)
+        cis = self.profile_cis
+        finite = np.isfinite(cis)
+        for name in ["all_fits", "cyt_dim", "mem_dim"]:
+            bands[name + "_lower"], bands[name + "_upper"] = [None, None], [None, None]
+        for j in range(2):
+            x = [self.res_x[j], np.full(self.n_x, j)]
+            grad = jacobians[self.model](x, *self.popt_full, fast=self.fast_model)
+            se = np.sqrt(np.einsum("ij,jk,ik->i", grad, self.covariance, grad))
+            bands["all_fits_lower"][j] = self.res_y[j] - z * se
+            bands["all_fits_upper"][j] = self.res_y[j] + z * se
+            cyt = 10 ** self.res_x[j] if self.log else self.res_x[j]
+            mem = 10 ** self.res_y[j] if self.log else self.res_y[j]
+            for name, conc in [("cyt_dim", cyt), ("mem_dim", mem)]:
+                dim = np.where(
+                    finite[j][:, None],
+                    100 * dimer_fraction(conc, np.where(finite[j], cis[j], 0)[:, None]),
+                    np.where(cis[j] > 0, 100, 0)[:, None],
+                )
+                bands[name + "_lower"][j] = np.min(dim, axis=0)
+                bands[name + "_upper"][j] = np.max(dim, axis=0)
+        return bands
+
+    def ci_table(self):
+        """
+        Confidence intervals of each parameter from the bootstrap and the profile
+        likelihood, side by side, whichever ci_method is set. Computes both if needed.
+
+        Returns:
+            pd.DataFrame: One row per parameter, with its full-data estimate, bootstrap
+                and profile likelihood bounds, and the number of fits each took
+        """
+        q = [(100 - self.interval) / 2, 50 + (self.interval / 2)]
+        bootstrap_cis = np.percentile(self.params, q, axis=0).T
+        return pd.DataFrame(
+            {
+                "Parameter": self.param_names,
+                "Estimate": self.popt_full,
+                "Bootstrap lower": bootstrap_cis[:, 0],
+                "Bootstrap upper": bootstrap_cis[:, 1],
+                "Bootstrap fits": self.n_bootstrap,
+                "Profile lower": self.profile_cis[:, 0],
+                "Profile upper": self.profile_cis[:, 1],
+                "Profile fits": [
+                    0 if profile is None else profile["fits"]
+                    for profile in self._profiles
+                ],
+            }
+        )
+
+    # Fitting
 
     def setup_curve_fit(self):
         """
@@ -302,71 +1050,154 @@ class EnergiesConfidenceIntervalPaired:
 
         return p0, bounds
 
-    def single_fit(self, cyt_l109r, mem):
+    def single_fit(self, cyt_l109r, mem, p0=None, full_output=False):
         """
         Fits the model to the data.
 
+        If fast_fit is set, curve_fit is given the closed-form Jacobian of the model
+        rather than estimating it by finite differences.
+
         Args:
             cyt_l109r (list): Cytoplasmic concentrations and L109R genotype
             mem (np.array): Membrane concentrations
+            p0 (list, optional): The initial guess for the parameters. Defaults to
+                self.p0_curve_fit.
+            full_output (bool, optional): A flag to also return fit counts. Defaults to
+                False.
 
         Returns:
             params (np.array): The parameters of the fitted model.
+            counts (np.array): Model evaluations, Jacobian evaluations (optimizer
+                iterations) and optimizer function evaluations (see fit_paired). Only
+                returned if full_output is True.
         """
+        popt, counts = fit_paired(
+            cyt_l109r, mem, **self.fit_options(self.p0_curve_fit if p0 is None else p0)
+        )
+        return (popt, counts) if full_output else popt
 
-        popt, _ = curve_fit(
-            self.model,
-            np.array(cyt_l109r),
-            mem,
-            maxfev=10000000,
-            p0=self.p0_curve_fit,
+    def fit_options(self, p0):
+        """
+        Keyword arguments for fit_paired, starting from p0 (sent to worker processes in
+        place of the whole object, so the payload doesn't grow with cached results).
+        """
+        return dict(
+            model=self.model,
+            p0=p0,
             bounds=self.bounds_curve_fit,
+            fast_fit=self.fast_fit,
+            fast_model=self.fast_model,
         )
-        return popt
 
-    def bootstrap_fitting(self, cyts_l109r, mems, n=10000):
+    def resample(self, cyts_l109r, mems, inds):
+        """
+        Generates a bootstrap sample, resampling each genotype separately (see
+        resample_paired).
+        """
+        return resample_paired(cyts_l109r, mems, inds)
+
+    def bootstrap_fitting(self, cyts_l109r, mems, n=10000, full_output=False):
         """
         Performs bootstrapping to estimate the parameters of the model.
 
+        Each bootstrap sample gets its own random number generator, spawned from a
+        SeedSequence seeded with self.seed. Successive calls continue spawning from the
+        same sequence, so generating 1000 then 9000 samples gives the same samples as
+        generating 10000 at once. Without a seed, indices are instead drawn here from
+        the copy of the global random state (in the same order as earlier versions),
+        which successive calls also continue. Samples are split into chunks of
+        self.chunk_size and fitted in a process pool of self.n_workers workers. Results
+        are identical for a given seed regardless of the number of workers or chunk
+        size.
+
+        If fast_fit is set, each fit is warm started from the full-data optimum
+        (self.popt_full).
+
         Args:
             cyts_l109r (list): Cytoplasmic concentrations and L109R genotype
             mems (np.array): Membrane concentrations
-            n (int, optional): The number of bootstrap samples to generate. Defaults to 10000.
+            n (int, optional): The number of bootstrap samples to generate. Defaults to
+                10000.
+            full_output (bool, optional): A flag to also return fit counts. Defaults to
+                False.
 
         Returns:
-            params (np.array): The parameters of the fitted model for each bootstrap sample.
+            params (np.array): The parameters of the fitted model for each bootstrap
+                sample.
+            counts (np.array): Fit counts for each bootstrap sample (see single_fit).
+                Only returned if full_output is True.
         """
-        # Split the input list into cytoplasmic concentrations and L109R genotype
-        cyts, l109r = cyts_l109r
-
-        # Initialize an array to store the parameters for each bootstrap sample
-        # The number of parameters depends on whether the D parameter is being fit
-        params = np.zeros([n, 4]) if self.fit_D else np.zeros([n, 3])
-
-        # Perform bootstrapping
-        for i in range(n):
-            # Initialize lists to store the bootstrap samples
-            _cyts, _mems, _l109r = [], [], []
-
-            # Generate a bootstrap sample for each genotype
-            for j in range(2):
-                # Select the data for the current genotype
-                __cyts = cyts[l109r == j]
-                __mems = mems[l109r == j]
-
-                # Generate a bootstrap sample by randomly selecting data with replacement
-                inds = np.random.choice(range(len(__cyts)), len(__cyts))
-                _cyts.append(__cyts[inds])
-                _mems.append(__mems[inds])
-                _l109r.append(np.full(len(inds), j))
+        # Nothing to fit (e.g. n_bootstrap was lowered then raised by fewer samples)
+        if n == 0:
+            params = np.zeros((0, len(self.p0_curve_fit)))
+            counts = np.zeros((0, 3), dtype=int)
+            return (params, counts) if full_output else params
+
+        # One random stream per bootstrap sample, or indices from the global stream
+        if self.seed is None:
+            samples = list(
+                zip(*bootstrap_indices(self._groups(), niter=n, rng=self._rng))
+            )
+        else:
+            samples = self._seed_sequence.spawn(n)
+        chunks = [
+            samples[i : i + self.chunk_size] for i in range(0, n, self.chunk_size)
+        ]
 
-            # Compile the bootstrap samples into arrays
-            _cyts = np.concatenate(_cyts)
-            _mems = np.concatenate(_mems)
-            _l109r = np.concatenate(_l109r)
+        # Workers get the data and fit options only (warm starting from the full-data
+        # fit if fast_fit is set), not the object with its cached results
+        options = self.fit_options(self.warm_start())
 
-            # Fit the model to the bootstrap sample and store the parameters
-            params[i, :] = self.single_fit([_cyts, _l109r], _mems)
+        # Fit chunks, serially or in a process pool (map preserves chunk order)
+        if self.n_workers == 1:
+            results = [
+                _bootstrap_fit_chunk(options, cyts_l109r, mems, c) for c in chunks
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                results = list(
+                    executor.map(
+                        _bootstrap_fit_chunk,
+                        [options] * len(chunks),
+                        [cyts_l109r] * len(chunks),
+                        [mems] * len(chunks),
+                        chunks,
+                    )
+                )
 
         # Return the parameters for each bootstrap sample
-        return params
+        results = np.concatenate(results).reshape(n, -1)
+        params, counts = results[:, :-3], results[:, -3:].astype(int)
+        return (params, counts) if full_output else params
+
+    def warm_start(self):
+        """
+        Returns the initial guess for bootstrap fits: the full-data optimum if fast_fit
+        is set, otherwise the default initial guess.
+        """
+        return self.popt_full if self.fast_fit else self.p0_curve_fit
+
+
+def _bootstrap_fit_chunk(options, cyts_l109r, mems, samples):
+    """
+    Fits a chunk of bootstrap samples (used by worker processes).
+
+    Args:
+        options (dict): Keyword arguments for fit_paired (see fit_options)
+        cyts_l109r (list): Cytoplasmic concentrations and L109R genotype
+        mems (np.array): Membrane concentrations
+        samples (list): SeedSequence for the random number generator of each bootstrap
+            sample in the chunk, or its indices for each genotype
+
+    Returns:
+        np.array: The parameters of the fitted model for each bootstrap sample, followed
+            by the fit counts (see fit_paired).
+    """
+    results = []
+    for sample in samples:
+        if isinstance(sample, np.random.SeedSequence):
+            sample = paired_indices(cyts_l109r[1], np.random.default_rng(sample))
+        _cyts_l109r, _mems = resample_paired(cyts_l109r, mems, sample)
+        popt, counts = fit_paired(_cyts_l109r, _mems, **options)
+        results.append(np.r_[popt, counts])
+    return np.array(results)
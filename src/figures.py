@@ -0,0 +1,304 @@
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence
+
+import matplotlib as mpl
+import pandas as pd
+
+from .storage import replacement_mode
+
+"""
+Figure export
+
+export_figure saves each figure in several formats at once (in parallel worker
+processes), and skips formats whose output is up to date. A figure is identified by a
+hash of its content, taken from an SVG rendering (which records every artist and its
+data, and is quicker to produce than PNG at 600 dpi or PDF). The hash, size and time of
+each export are recorded next to the figures (Figs/.export/<name>.json).
+
+"""
+
+# Formats saved at the dpi given to export_figure (vector formats use the figure dpi)
+raster_formats = ("png", "jpg", "jpeg", "tif", "tiff")
+
+# Save formats in parallel if they took longer than this (seconds, in total) last time
+parallel_threshold = 1.0
+
+# Exports in this session (see export_report)
+export_log = []
+
+_executor = None
+
+
+def figure_hash(fig) -> str:
+    """
+    Returns:
+        str: hash of the content of a figure (the same for identical figures, across
+            sessions)
+    """
+    buffer = io.BytesIO()
+    with mpl.rc_context({"svg.hashsalt": "export_figure"}):
+        fig.savefig(buffer, format="svg", metadata={"Date": None})
+    return hashlib.sha1(buffer.getvalue()).hexdigest()
+
+
+def export_figure(
+    fig,
+    path: str,
+    formats: Sequence[str] = ("png", "pdf"),
+    dpi: float = 600,
+    transparent: bool = True,
+    cache: bool = True,
+    n_workers: Optional[int] = None,
+    **kwargs,
+):
+    """
+    Saves a figure in several formats in parallel, skipping up-to-date outputs.
+
+    Usage:
+        export_figure(fig, "Figs/mc_ratio")  # Figs/mc_ratio.png and Figs/mc_ratio.pdf
+
+    Args:
+        fig: matplotlib figure
+        path (str): output path, without extension
+        formats (Sequence[str], optional): formats to save. Defaults to ("png", "pdf").
+        dpi (float, optional): resolution of raster formats. Defaults to 600.
+        transparent (bool, optional): passed to savefig. Defaults to True.
+        cache (bool, optional): skip formats whose output exists and was last saved
+            from an identical figure with the same options. Defaults to True.
+        n_workers (int, optional): number of processes saving formats at once. By
+            default, one per format to save (up to the number of CPUs) if they took
+            longer than parallel_threshold to save last time (for quick figures,
+            starting workers and sending them the figure costs more than it saves).
+            If 1 (or the figure can't be pickled), formats are saved one after another
+            in this process.
+        **kwargs: passed to savefig (e.g. bbox_inches)
+    """
+    start_time = time.perf_counter()
+    outputs = {f: "%s.%s" % (path, f) for f in formats}
+    options = {
+        f: dict(
+            kwargs,
+            transparent=transparent,
+            **({"dpi": dpi} if f in raster_formats else {}),
+        )
+        for f in formats
+    }
+
+    # Skip formats that are up to date
+    record_path = _record_path(path)
+    record = _load_record(record_path)
+    if cache:
+        content = figure_hash(fig)
+        keys = {f: _key(content, f, options[f]) for f in formats}
+        todo = [
+            f for f in formats if not _up_to_date(record.get(f), outputs[f], keys[f])
+        ]
+    else:
+        keys = {f: None for f in formats}
+        todo = list(formats)
+
+    # Save
+    if n_workers is None:
+        last_seconds = sum(record.get(f, {}).get("seconds", 0) for f in todo)
+        n_workers = len(todo) if last_seconds > parallel_threshold else 1
+        n_workers = min(n_workers, _cpu_count())
+    results = _save_all(fig, outputs, options, todo, n_workers)
+    for f, (n_bytes, seconds) in results.items():
+        record[f] = {
+            "key": keys[f],
+            "bytes": n_bytes,
+            "seconds": seconds,
+            "mtime_ns": os.stat(outputs[f]).st_mtime_ns,
+        }
+    if results:
+        _save_record(record_path, record)
+
+    # Log
+    for f in formats:
+        n_bytes, seconds = results.get(f, (0, 0.0))
+        export_log.append(
+            {
+                "Figure": path,
+                "Format": f,
+                "Bytes": n_bytes,
+                "Seconds": seconds,
+                "Skipped": f not in results,
+            }
+        )
+    export_log.append(
+        {
+            "Figure": path,
+            "Format": "total",
+            "Bytes": sum(r[0] for r in results.values()),
+            "Seconds": time.perf_counter() - start_time,
+            "Skipped": not results,
+        }
+    )
+
+
+def export_report(pattern: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bytes written and time spent exporting figures.
+
+    Usage:
+        export_report()  # exports in this session, including skipped ones
+        export_report("scripts/Analysis/*/Figs")  # last export of every figure
+
+    Args:
+        pattern (str, optional): glob pattern of figure folders. If given, reports the
+            last export of each figure in them (most expensive first), rather than the
+            exports in this session.
+
+    Returns:
+        pd.DataFrame: one row per figure and format (and a total per figure for this
+            session)
+    """
+    if pattern is None:
+        return pd.DataFrame(
+            export_log, columns=["Figure", "Format", "Bytes", "Seconds", "Skipped"]
+        )
+    rows = []
+    for record_path in sorted(glob.glob(os.path.join(pattern, ".export", "*.json"))):
+        figure = os.path.join(
+            os.path.dirname(os.path.dirname(record_path)),
+            os.path.basename(record_path)[: -len(".json")],
+        )
+        for f, entry in _load_record(record_path).items():
+            rows.append(
+                {
+                    "Figure": figure,
+                    "Format": f,
+                    "Bytes": entry["bytes"],
+                    "Seconds": entry["seconds"],
+                }
+            )
+    df = pd.DataFrame(rows, columns=["Figure", "Format", "Bytes", "Seconds"])
+    return df.sort_values("Seconds", ascending=False, ignore_index=True)
+
+
+"""
+Saving
+
+"""
+
+
+def _save_all(fig, outputs, options, todo, n_workers) -> dict:
+    # Saves formats in todo, returning format -> (bytes, seconds)
+    if n_workers > 1 and len(todo) > 1:
+        try:
+            data = pickle.dumps(fig)
+        except Exception:
+            data = None
+        if data is not None:
+            rc = {k: v for k, v in mpl.rcParams.items() if not k.startswith("backend")}
+            executor = _get_executor(n_workers)
+            futures = {
+                f: executor.submit(_save_pickled, data, rc, outputs[f], f, options[f])
+                for f in todo
+            }
+            return {f: future.result() for f, future in futures.items()}
+    return {f: _save(fig, outputs[f], f, options[f]) for f in todo}
+
+
+def _get_executor(n_workers: int) -> ProcessPoolExecutor:
+    # Worker processes, kept for later exports (spawned, as jax is not fork-safe)
+    global _executor
+    if _executor is None or _executor._max_workers < n_workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        return os.cpu_count() or 1
+
+
+def _save_pickled(data, rc, path, format, options) -> tuple:
+    # Runs in a worker process
+    mpl.use("Agg")
+    with mpl.rc_context(rc):
+        fig = pickle.loads(data)
+        try:
+            return _save(fig, path, format, options)
+        finally:
+            if "matplotlib.pyplot" in sys.modules:
+                sys.modules["matplotlib.pyplot"].close(fig)
+
+
+def _save(fig, path, format, options) -> tuple:
+    # Save to a temporary file (with the permissions of the file it replaces), then move
+    # into place
+    start_time = time.perf_counter()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix="." + format)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            fig.savefig(f, format=format, **options)
+        os.chmod(tmp, replacement_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return os.path.getsize(path), time.perf_counter() - start_time
+
+
+"""
+Export records
+
+"""
+
+
+def _key(content: str, format: str, options: dict) -> str:
+    return hashlib.sha1(
+        json.dumps([content, format, options], sort_keys=True, default=repr).encode()
+    ).hexdigest()
+
+
+def _record_path(path: str) -> str:
+    return os.path.join(
+        os.path.dirname(os.path.abspath(path)),
+        ".export",
+        os.path.basename(path) + ".json",
+    )
+
+
+def _load_record(record_path: str) -> dict:
+    try:
+        with open(record_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_record(record_path: str, record: dict):
+    os.makedirs(os.path.dirname(record_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(record_path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(record, f, indent=1)
+    os.chmod(tmp, replacement_mode(record_path))
+    os.replace(tmp, record_path)
+
+
+def _up_to_date(entry: Optional[dict], output: str, key: str) -> bool:
+    # Output was saved with this key, and hasn't been changed since
+    if entry is None or entry.get("key") != key or not os.path.exists(output):
+        return False
+    stat = os.stat(output)
+    return stat.st_size == entry["bytes"] and stat.st_mtime_ns == entry["mtime_ns"]
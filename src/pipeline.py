@@ -0,0 +1,513 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import nbformat
+
+"""
+Dependency inference
+
+"""
+
+# File paths passed as string literals to common readers/writers
+READ_PATTERN = re.compile(
+    r"(?:read_csv|read_excel|loadtxt|np\.load)\(\s*[\"']([^\"']+)[\"']"
+)
+WRITE_PATTERN = re.compile(
+    r"(?:to_csv|to_excel|savetxt|np\.save)\(\s*[\"']([^\"']+)[\"']"
+)
+
+# Files read and written by src helpers: quantify_manifest(manifest, output),
+# export_figure(fig, path, formats=...) and the stats table (add_stats_table_row and
+# StatsTable, which write to df_path)
+QUANTIFY_PATTERN = re.compile(
+    r"quantify_manifest\(\s*(?:manifest\s*=\s*)?(?:[\"']([^\"']+)[\"']|[\w.]+)\s*,"
+    r"\s*(?:output\s*=\s*)?[\"']([^\"']+)[\"']"
+)
+FIGURE_PATTERN = re.compile(
+    r"export_figure\(\s*[\w.]+\s*,\s*(?:path\s*=\s*)?[\"']([^\"']+)[\"']"
+    r"(?:[^)]*?formats\s*=\s*[(\[]([^)\]]*))?"
+)
+STATS_TABLE_PATTERN = re.compile(
+    r"(?:add_stats_table_row\(|StatsTable\(\s*(?:df_path\s*=\s*)?[\"']([^\"']+)[\"']"
+    r"|StatsTable\(|df_path\s*=\s*[\"']([^\"']+)[\"'])"
+)
+STRING_PATTERN = re.compile(r"[\"']([^\"']+)[\"']")
+
+# Defaults of the helpers above
+FIGURE_FORMATS = ("png", "pdf")
+STATS_TABLE_PATH = "../../../data/stats_table.csv"
+
+
+def helper_io(code: str) -> tuple:
+    """
+    Finds the files that calls to src helpers in code read and write.
+
+    Paths must be string literals. Figure outputs are the path with each format (as a
+    literal list or tuple, else the default formats). If code uses the stats table, its
+    output is every literal df_path in the code, or the default path if there are none.
+
+    Args:
+        code (str): notebook code
+
+    Returns:
+        tuple: lists of paths read and written
+    """
+    inputs, outputs = [], []
+    for manifest, output in QUANTIFY_PATTERN.findall(code):
+        inputs += [manifest] if manifest else []
+        outputs.append(output)
+    for path, formats in FIGURE_PATTERN.findall(code):
+        formats = STRING_PATTERN.findall(formats) if formats else FIGURE_FORMATS
+        outputs += ["%s.%s" % (path, f) for f in formats]
+    stats_tables = STATS_TABLE_PATTERN.findall(code)
+    if stats_tables:
+        paths = [a or b for a, b in stats_tables if a or b]
+        outputs += paths or [STATS_TABLE_PATH]
+    return inputs, outputs
+
+
+def notebook_io(path: str) -> tuple:
+    """
+    Finds the files that a notebook reads and writes.
+
+    Files are inferred from string literals passed to functions like pd.read_csv and
+    df.to_csv in the code cells (commented-out lines are ignored), and to src helpers
+    that read or write files (see helper_io). Further files can be declared in the
+    notebook metadata, e.g. {"pipeline": {"inputs": [...], "outputs": [...]}}, with
+    paths relative to the notebook folder.
+
+    Args:
+        path (str): path to notebook
+
+    Returns:
+        tuple: sets of absolute paths read and written by the notebook
+    """
+    nb = nbformat.read(path, as_version=4)
+    directory = os.path.dirname(os.path.abspath(path))
+    code = "\n".join(
+        line
+        for cell in nb.cells
+        if cell.cell_type == "code"
+        for line in cell.source.splitlines()
+        if not line.lstrip().startswith("#")
+    )
+    declared = nb.metadata.get("pipeline", {})
+    helper_inputs, helper_outputs = helper_io(code)
+    inputs = READ_PATTERN.findall(code) + helper_inputs + declared.get("inputs", [])
+    outputs = WRITE_PATTERN.findall(code) + helper_outputs + declared.get("outputs", [])
+
+    def resolve(files):
+        return {os.path.normpath(os.path.join(directory, f)) for f in files}
+
+    return resolve(inputs), resolve(outputs)
+
+
+def build_graph(notebooks: list) -> dict:
+    """
+    Works out which notebooks need to run before which.
+
+    A notebook depends on every other notebook that writes a file it reads. If several
+    notebooks write the same file, they run in list order.
+
+    Args:
+        notebooks (list): notebook paths, in the default run order
+
+    Returns:
+        dict: for each notebook, the set of notebooks that must finish first
+    """
+    io = {nb: notebook_io(nb) for nb in notebooks}
+    graph = {nb: set() for nb in notebooks}
+    for i, a in enumerate(notebooks):
+        for j, b in enumerate(notebooks):
+            if a == b:
+                continue
+            # a reads something that b writes
+            if io[a][0] & io[b][1]:
+                graph[a].add(b)
+            # a and b write the same file: run in list order
+            elif j < i and io[a][1] & io[b][1]:
+                graph[a].add(b)
+
+    # Check for cycles
+    order = topological_order(graph)
+    if len(order) < len(graph):
+        cycle = sorted(set(graph) - set(order))
+        raise ValueError("Circular dependencies between notebooks: %s" % cycle)
+    return graph
+
+
+def topological_order(graph: dict) -> list:
+    """
+    Orders notebooks so that each comes after its dependencies (Kahn's algorithm).
+    Notebooks on a cycle are left out.
+    """
+    remaining = {nb: set(deps) for nb, deps in graph.items()}
+    order = []
+    ready = [nb for nb in graph if not remaining[nb]]
+    while ready:
+        nb = ready.pop(0)
+        order.append(nb)
+        for other, deps in remaining.items():
+            if nb in deps:
+                deps.remove(nb)
+                if not deps:
+                    ready.append(other)
+    return order
+
+
+"""
+Execution
+
+"""
+
+
+def execute_notebook(path: str, profile: bool = False) -> dict:
+    """
+    Executes a notebook in a fresh kernel and saves the output in place.
+
+    Args:
+        path (str): path to notebook
+        profile (bool, optional): record wall time and peak memory for each cell, and
+            time spent in src entry points (see src/profiling.py). Defaults to False.
+
+    Returns:
+        dict: status ("ok", "error" or "timeout") and wall time in seconds, plus "cells"
+            and "calls" if profiling
+    """
+    from nbconvert.preprocessors import ExecutePreprocessor
+    from nbconvert.preprocessors.execute import CellExecutionError
+
+    from .profiling import setup_source
+
+    start_time = time.time()
+    with open(path) as file:
+        nb = nbformat.read(file, as_version=4)
+
+    # Add a cell to start profiling in the kernel
+    if profile:
+        fd, profile_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        nb.cells.insert(0, nbformat.v4.new_code_cell(setup_source(profile_path)))
+
+    ep = ExecutePreprocessor(kernel_name="python3")
+    try:
+        ep.preprocess(nb, {"metadata": {"path": os.path.dirname(path)}})
+        status = "ok"
+    except CellExecutionError:
+        status = "error"
+    except TimeoutError:
+        status = "timeout"
+    finally:
+        # Save output
+        if profile:
+            nb.cells.pop(0)
+        nbformat.write(nb, path)
+    result = {"status": status, "wall_time": time.time() - start_time}
+
+    # Collect profile, matching cells to their index in the notebook
+    if profile:
+        with open(profile_path) as f:
+            content = f.read()
+        os.remove(profile_path)
+        result.update(json.loads(content) if content else {"cells": [], "calls": {}})
+        executed = [
+            i
+            for i, cell in enumerate(nb.cells)
+            if cell.cell_type == "code" and cell.source.strip()
+        ]
+        for i, cell in zip(executed, result["cells"]):
+            cell["index"] = i
+    return result
+
+
+def run_pipeline(
+    notebooks: list,
+    workers: int = 1,
+    graph: dict = None,
+    callback=None,
+    profile: bool = False,
+) -> dict:
+    """
+    Executes notebooks concurrently, each one starting once its dependencies are done.
+
+    Notebooks still run if a dependency fails (using whatever files exist), as when
+    running serially. Dependencies that are not in notebooks are treated as done.
+
+    Args:
+        notebooks (list): notebook paths, in the default run order
+        workers (int, optional): number of notebooks to run at once. Defaults to 1.
+        graph (dict, optional): dependencies (see build_graph). Defaults to None
+            (inferred).
+        callback (Callable, optional): called with the notebook path and result as each
+            notebook finishes. Defaults to None.
+        profile (bool, optional): profile cells and src entry points (see
+            execute_notebook). Defaults to False.
+
+    Returns:
+        dict: results of execute_notebook for each notebook
+    """
+    graph = build_graph(notebooks) if graph is None else graph
+    graph = {nb: graph[nb] & set(notebooks) for nb in notebooks}
+    pending = list(notebooks)
+    results, running = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            # Start any notebooks whose dependencies are done
+            for nb in [nb for nb in pending if graph[nb] <= results.keys()]:
+                if len(running) >= workers:
+                    break
+                pending.remove(nb)
+                print(
+                    "Running",
+                    nb,
+                    ":",
+                    len(results) + len(running) + 1,
+                    "/",
+                    len(notebooks),
+                )
+                running[executor.submit(execute_notebook, nb, profile)] = nb
+
+            # Wait for a notebook to finish
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                nb = running.pop(future)
+                results[nb] = future.result()
+                if callback is not None:
+                    callback(nb, results[nb])
+                if results[nb]["status"] != "ok":
+                    print(
+                        'Error executing the notebook "%s" (%s).\n'
+                        % (nb, results[nb]["status"])
+                    )
+    return results
+
+
+"""
+Incremental runs
+
+"""
+
+
+def file_hash(path: str) -> str:
+    """
+    Returns:
+        str: SHA-256 of the file contents, or None if the file doesn't exist
+    """
+    if not os.path.isfile(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def notebook_hash(path: str) -> str:
+    """
+    Hash of the cell sources of a notebook (ignoring outputs, which change on every
+    run).
+    """
+    nb = nbformat.read(path, as_version=4)
+    h = hashlib.sha256()
+    for cell in nb.cells:
+        h.update(json.dumps([cell.cell_type, cell.source]).encode())
+    return h.hexdigest()
+
+
+def src_hash() -> str:
+    """
+    Hash of the python files in the src package.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            h.update(name.encode())
+            h.update(str(file_hash(os.path.join(directory, name))).encode())
+    return h.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Loads the record of previous runs, or an empty record if there isn't one.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def notebook_record(path: str) -> dict:
+    """
+    Hashes of everything a notebook's results depend on, and of the files it wrote.
+
+    Returns:
+        dict: manifest entry for the notebook
+    """
+    inputs, outputs = notebook_io(path)
+    return {
+        "notebook": notebook_hash(path),
+        "src": src_hash(),
+        "inputs": {os.path.relpath(f): file_hash(f) for f in sorted(inputs)},
+        "outputs": {os.path.relpath(f): file_hash(f) for f in sorted(outputs)},
+    }
+
+
+def plan(notebooks: list, graph: dict, manifest: dict) -> dict:
+    """
+    Works out which notebooks need to run, make-style.
+
+    A notebook runs if it hasn't run successfully before, if its source, the src package
+    or any file it reads has changed since, if any file it wrote is missing or has been
+    modified, or if a notebook it depends on will run. Files that several notebooks
+    write to (e.g. rows of the stats table) are only checked for being missing, as each
+    notebook's record of them goes out of date when the next one writes.
+
+    Args:
+        notebooks (list): notebook paths, in the default run order
+        graph (dict): dependencies (see build_graph)
+        manifest (dict): record of previous runs (see notebook_record)
+
+    Returns:
+        dict: reason to run each notebook, or None if it is up to date
+    """
+    records = {nb: notebook_record(nb) for nb in notebooks}
+    written = [f for r in records.values() for f in r["outputs"]]
+    shared = {f for f in written if written.count(f) > 1}
+    reasons = {}
+    for nb in topological_order(graph):
+        record = manifest.get(nb)
+        current = records[nb]
+        upstream = sorted(d for d in graph[nb] if reasons.get(d))
+        if record is None:
+            reasons[nb] = "no previous run"
+        elif upstream:
+            reasons[nb] = "upstream notebook will run: %s" % ", ".join(upstream)
+        elif record["notebook"] != current["notebook"]:
+            reasons[nb] = "notebook changed"
+        elif record["src"] != current["src"]:
+            reasons[nb] = "src package changed"
+        else:
+            changed = [
+                f
+                for kind in ["inputs", "outputs"]
+                for f in sorted(set(record[kind]) | set(current[kind]))
+                if record[kind].get(f) != current[kind].get(f)
+                and not (kind == "outputs" and f in shared and current[kind].get(f))
+            ]
+            reasons[nb] = "files changed: %s" % ", ".join(changed) if changed else None
+    return {nb: reasons[nb] for nb in notebooks}
+
+
+def print_plan(reasons: dict):
+    """
+    Prints which notebooks will run and why.
+    """
+    for nb, reason in reasons.items():
+        print(
+            "%s %s%s"
+            % ("RUN " if reason else "SKIP", nb, ": " + reason if reason else "")
+        )
+    print(
+        "\n%s of %s notebooks to run"
+        % (sum(bool(r) for r in reasons.values()), len(reasons))
+    )
+
+
+"""
+Reporting
+
+"""
+
+
+def critical_path(graph: dict, times: dict) -> tuple:
+    """
+    Finds the longest chain of dependent notebooks, weighted by wall time.
+
+    This is the shortest possible total run time with unlimited workers.
+
+    Returns:
+        tuple: length of the critical path (seconds), and the notebooks on it
+    """
+    finish, previous = {}, {}
+    for nb in topological_order(graph):
+        deps = [d for d in graph[nb] if d in finish]
+        before = max(deps, key=lambda d: finish[d], default=None)
+        finish[nb] = times.get(nb, 0) + (finish[before] if before else 0)
+        previous[nb] = before
+    if not finish:
+        return 0, []
+    nb = max(finish, key=finish.get)
+    length, path = finish[nb], []
+    while nb is not None:
+        path.insert(0, nb)
+        nb = previous[nb]
+    return length, path
+
+
+def print_report(results: dict, graph: dict, elapsed_time: float, n_top: int = 20):
+    """
+    Prints wall time for each notebook (slowest first) and the critical path. If the
+    notebooks were profiled, also prints the slowest cells (with the peak memory of the
+    kernel so far, and how much each cell raised it) and time spent in src entry points.
+    """
+    times = {nb: r["wall_time"] for nb, r in results.items()}
+    width = max([len("Notebook")] + [len(nb) for nb in times])
+    print("\n%s  %8s  %s" % ("Notebook".ljust(width), "Time (s)", "Status"))
+    for nb in sorted(times, key=times.get, reverse=True):
+        print("%s  %8.1f  %s" % (nb.ljust(width), times[nb], results[nb]["status"]))
+
+    # Slowest cells across all notebooks
+    cells = [(nb, c) for nb, r in results.items() for c in r.get("cells", [])]
+    if cells:
+        print(
+            "\n%8s  %13s  %13s  %s"
+            % ("Time (s)", "Peak RSS (MB)", "Increase (MB)", "Cell")
+        )
+        for nb, c in sorted(cells, key=lambda x: x[1]["wall_time"], reverse=True)[
+            :n_top
+        ]:
+            rss = [
+                "%13.0f" % c[k] if c.get(k) is not None else " " * 13
+                for k in ["process_peak_rss_mb", "peak_rss_increase_mb"]
+            ]
+            print(
+                "%8.1f  %s  %s  %s [%s]: %s"
+                % (c["wall_time"], *rss, nb, c.get("index"), c["source"][:60])
+            )
+
+    # Time in src entry points, summed over notebooks
+    calls = {}
+    for r in results.values():
+        for name, c in r.get("calls", {}).items():
+            total = calls.setdefault(name, {"count": 0, "wall_time": 0})
+            total["count"] += c["count"]
+            total["wall_time"] += c["wall_time"]
+    if calls:
+        print("\n%8s  %6s  %s" % ("Time (s)", "Calls", "Function"))
+        for name in sorted(calls, key=lambda n: calls[n]["wall_time"], reverse=True):
+            print(
+                "%8.1f  %6d  %s"
+                % (calls[name]["wall_time"], calls[name]["count"], name)
+            )
+
+    length, path = critical_path(graph, times)
+    print("\nTotal notebook time: %.1f s" % sum(times.values()))
+    print("Critical path: %.1f s (%s)" % (length, " -> ".join(path)))
+    print(
+        "Finished! (%s minutes, %s seconds)"
+        % (int(elapsed_time // 60), int(elapsed_time % 60))
+    )
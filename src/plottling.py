@@ -3,9 +3,12 @@ import random
 
 import matplotlib.colors as mc
 import numpy as np
+import pandas as pd
 import seaborn as sns
 from matplotlib.ticker import FuncFormatter
 
+from .swarm import swarm
+
 
 def dataplot(
     data,
@@ -27,6 +30,9 @@ def dataplot(
 
     Main function for swarmplots in the paper
 
+    Points are laid out with the beeswarm in swarm.py (one scatter per category), with
+    the same colors, labels and legend as sns.swarmplot.
+
     Args:
         data (_type_): pandas dataframe
         x (_type_): name of x axis variable (categorical variable)
@@ -44,8 +50,17 @@ def dataplot(
         linewidth_mean (int, optional): thickness of mean line. Defaults to 1.
     """
 
+    # Group rows by category once (rows outside order, or without a value, are dropped)
+    codes = pd.Categorical(data[x], categories=order).codes
+    values = data[y].to_numpy(dtype=float)
+    keep = (codes >= 0) & ~np.isnan(values)
+    counts = np.bincount(codes[keep], minlength=len(order))
+    sort = np.flatnonzero(keep)[np.argsort(codes[keep], kind="stable")]
+    groups = np.split(sort, np.cumsum(counts)[:-1])
+
     # Calculate means
-    df_mean = [data[data[x] == o][y].mean() for o in order]
+    with np.errstate(invalid="ignore"):
+        df_mean = np.bincount(codes[keep], values[keep], len(order)) / counts
 
     # Draw mean lines
     [
@@ -60,20 +75,62 @@ def dataplot(
         for i, y in enumerate(df_mean)
     ]
 
-    # Draw points
-    sns.swarmplot(
-        data=data,
-        x=x,
-        y=y,
-        ax=ax,
-        order=order,
-        linewidth=linewidth,
-        transform=transform,
-        color=color,
-        hue=hue,
-        palette=palette,
-        marker=marker,
-    )
+    # Draw points (one swarm per category)
+    colors, hue_colors = _point_colors(data, x, order, hue, palette, color)
+    for i, rows in enumerate(groups):
+        swarm(
+            ax,
+            i,
+            values[rows],
+            colors[rows],
+            linewidth=linewidth,
+            marker=marker,
+            transform=transform,
+        )
+
+    # Label axes as sns.swarmplot
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.set_xticks(np.arange(len(order)))
+    ax.set_xticklabels([str(o) for o in order])
+    ax.xaxis.grid(False)
+    ax.set_xlim(-0.5, len(order) - 0.5, auto=None)
+    if hue is not None:
+        for name, c in hue_colors.items():
+            ax.scatter([], [], color=c, label=name, s=60)
+        ax.legend(loc="best", title=hue)
+
+
+def _point_colors(data, x, order, hue, palette, color):
+    # RGBA color of each row, and colors of hue levels (as sns.swarmplot)
+    key = x if hue is None else hue
+    if hue is None or hue == x:
+        levels = list(order)
+    elif pd.api.types.is_numeric_dtype(data[hue]):
+        levels = sorted(data[hue].dropna().unique())
+    else:
+        levels = list(data[hue].dropna().unique())
+
+    # Palette (for x categories if there is no hue)
+    if isinstance(palette, dict):
+        level_colors = [palette[level] for level in levels]
+    elif palette is not None:
+        level_colors = sns.color_palette(palette, len(levels))
+    elif color is not None and hue is None:
+        level_colors = [color] * len(levels)
+    elif color is not None:
+        level_colors = sns.dark_palette(color, len(levels))
+    else:
+        level_colors = sns.color_palette(n_colors=len(levels))
+    level_colors = mc.to_rgba_array(level_colors)
+
+    # Rows with a level not in the palette (only possible for hue) are transparent
+    codes = pd.Categorical(data[key], categories=levels).codes
+    colors = np.r_[level_colors, [[0, 0, 0, 0]]][codes]
+    hue_colors = {
+        name: mc.to_hex(c) for name, c in zip(levels, level_colors) if hue is not None
+    }
+    return colors, hue_colors
 
 
 def lighten(color, amount=1.8):
@@ -120,27 +177,73 @@ def minor_ticks(ax, x=True, y=True):
 
 
 class random_grouped_scatter:
-    def __init__(self, linewidth=0.1, edgecolors="k", s=20):
-        self.points = []
+    """
+    Scatter plot of several groups of points, drawn in a random order so that no group
+    is hidden behind another.
+
+    Points are stored in preallocated arrays, and plot draws a single scatter for each
+    marker type (with per-point colors), keeping the random order within each one.
+
+    Usage:
+        r = random_grouped_scatter()
+        r.add(x1, y1, "tab:blue")
+        r.add(x2, y2, "tab:orange", marker="^")
+        r.plot(ax)
+    """
+
+    def __init__(self, linewidth=0.1, edgecolors="k", s=20, capacity=1024):
         self.linewidth = linewidth
         self.edgecolors = edgecolors
         self.s = s
 
+        # Point data (the first n rows are in use)
+        self.n = 0
+        self.x = np.empty(capacity)
+        self.y = np.empty(capacity)
+        self.rgba = np.empty((capacity, 4))
+        self.marker_codes = np.empty(capacity, dtype=int)
+        self.markers = []  # marker of each code
+
     def add(self, x, y, color, marker="o"):
-        for _x, _y in zip(x, y):
-            self.points.append({"x": _x, "y": _y, "color": color, "marker": marker})
+        x, y = np.ravel(x), np.ravel(y)
+        n = min(len(x), len(y))
+        self._reserve(self.n + n)
+        if marker not in self.markers:
+            self.markers.append(marker)
+        new = slice(self.n, self.n + n)
+        self.x[new] = x[:n]
+        self.y[new] = y[:n]
+        self.rgba[new] = mc.to_rgba(color)
+        self.marker_codes[new] = self.markers.index(marker)
+        self.n += n
+
+    def _reserve(self, n):
+        # Grow the arrays (doubling) to hold at least n points
+        if n <= len(self.x):
+            return
+        capacity = max(n, 2 * len(self.x))
+        for name in ["x", "y", "rgba", "marker_codes"]:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[: self.n] = old[: self.n]
+            setattr(self, name, new)
 
     def plot(self, ax):
-        random.shuffle(self.points)
-        for p in self.points:
+        order = list(range(self.n))
+        random.shuffle(order)
+        order = np.array(order, dtype=int)
+        for code, marker in enumerate(self.markers):
+            points = order[self.marker_codes[order] == code]
+            if len(points) == 0:
+                continue
             ax.scatter(
-                p["x"],
-                p["y"],
+                self.x[points],
+                self.y[points],
                 linewidth=self.linewidth,
                 edgecolors=self.edgecolors,
                 s=self.s,
-                color=p["color"],
-                marker=p["marker"],
+                c=self.rgba[points],
+                marker=marker,
             )
 
 
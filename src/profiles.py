@@ -0,0 +1,156 @@
+from typing import Optional
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+from .summary import bounded_means
+
+"""
+Batched transforms of membrane profiles
+
+All functions act along one axis of an array of profiles, e.g. (n_embryos, n_positions),
+so a whole dataset can be transformed with a single call. Where profiles have different
+lengths, they are stored padded with NaN (see dense_profiles) and lengths gives the
+length of each one.
+
+"""
+
+
+def fold(array: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Symmetrises profiles by averaging the two halves, with the first reversed.
+
+    For profiles starting and ending at the posterior pole, the output runs from the
+    anterior pole to the posterior pole.
+
+    Args:
+        array (np.ndarray): profiles, with an even number of positions along axis
+        axis (int, optional): position axis. Defaults to -1.
+
+    Returns:
+        np.ndarray: folded profiles, with half as many positions
+    """
+    array = np.asarray(array)
+    n = array.shape[axis]
+    if n % 2:
+        raise ValueError("Profiles must have an even number of positions")
+    first = np.flip(np.take(array, np.arange(n // 2), axis=axis), axis=axis)
+    second = np.take(array, np.arange(n // 2, n), axis=axis)
+    return (first + second) / 2
+
+
+def resample(
+    array: np.ndarray,
+    n: int,
+    axis: int = -1,
+    lengths: Optional[np.ndarray] = None,
+    method: str = "cubic",
+) -> np.ndarray:
+    """
+    Batched interp_1d_array: interpolates each profile to n evenly spaced points.
+
+    Args:
+        array (np.ndarray): profiles
+        n (int): number of points
+        axis (int, optional): position axis. Defaults to -1.
+        lengths (np.ndarray, optional): length of each profile, for NaN-padded 2D
+            arrays (position axis last). Defaults to the full length of the axis.
+        method (str, optional): 'linear' or 'cubic'. Defaults to "cubic".
+
+    Returns:
+        np.ndarray: resampled profiles, with n positions along axis
+    """
+    if method not in ("linear", "cubic"):
+        raise ValueError("Invalid method. Choose either 'linear' or 'cubic'.")
+    array = np.moveaxis(np.asarray(array, dtype=float), axis, -1)
+    if lengths is None:
+        output = _resample(array, n, method)
+    else:
+        # Profiles of the same length are done together
+        output = np.empty(array.shape[:-1] + (n,))
+        for length in np.unique(lengths):
+            rows = lengths == length
+            output[rows] = _resample(array[rows, :length], n, method)
+    return np.moveaxis(output, -1, axis)
+
+
+def _resample(array: np.ndarray, n: int, method: str) -> np.ndarray:
+    # Resample along the last axis, all profiles having the same length
+    length = array.shape[-1]
+    x_new = np.linspace(0, length - 1, n)
+    if method == "cubic":
+        return CubicSpline(np.arange(length), array, axis=-1)(x_new)
+
+    # Linear interpolation between neighbouring positions
+    i = np.clip(x_new.astype(int), 0, max(length - 2, 0))
+    j = np.minimum(i + 1, length - 1)
+    t = x_new - i
+    return array[..., i] * (1 - t) + array[..., j] * t
+
+
+def normalise(array: np.ndarray, axis: int = -1, method: str = "max") -> np.ndarray:
+    """
+    Scales each profile by its maximum, mean or sum (NaN padding ignored).
+
+    Args:
+        array (np.ndarray): profiles
+        axis (int, optional): position axis. Defaults to -1.
+        method (str, optional): 'max', 'mean' or 'sum'. Defaults to "max".
+
+    Returns:
+        np.ndarray: normalised profiles
+    """
+    funcs = {"max": np.nanmax, "mean": np.nanmean, "sum": np.nansum}
+    if method not in funcs:
+        raise ValueError("Invalid method. Choose 'max', 'mean' or 'sum'.")
+    return array / funcs[method](array, axis=axis, keepdims=True)
+
+
+def window_mean(
+    array: np.ndarray,
+    bounds: tuple,
+    axis: int = -1,
+    lengths: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Batched bounded_mean_1d: mean of each profile over a window.
+
+    Args:
+        array (np.ndarray): profiles
+        bounds (tuple): (min, max) from 0 to 1, wrapping around if min > max
+            (e.g. (0.9, 0.1))
+        axis (int, optional): position axis. Defaults to -1.
+        lengths (np.ndarray, optional): length of each profile, for NaN-padded 2D
+            arrays. Defaults to the full length of the axis.
+
+    Returns:
+        np.ndarray: window means, with the position axis removed
+    """
+    array = np.moveaxis(np.asarray(array, dtype=float), axis, -1)
+    shape = array.shape[:-1]
+    array = array.reshape(-1, array.shape[-1])
+    if lengths is None:
+        lengths = np.full(len(array), array.shape[-1])
+    return bounded_means(array, np.ravel(lengths), bounds).reshape(shape)
+
+
+def anterior_posterior(
+    array: np.ndarray,
+    axis: int = -1,
+    lengths: Optional[np.ndarray] = None,
+    anterior: tuple = (0.4, 0.6),
+    posterior: tuple = (0.9, 0.1),
+) -> tuple:
+    """
+    Anterior and posterior window means of each profile (see window_mean).
+
+    The default windows are those used for Mem_ant and Mem_post throughout the analysis
+    notebooks (profiles starting and ending at the posterior pole).
+
+    Returns:
+        tuple: (anterior means, posterior means)
+    """
+    return (
+        window_mean(array, anterior, axis, lengths),
+        window_mean(array, posterior, axis, lengths),
+    )
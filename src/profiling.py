@@ -0,0 +1,146 @@
+import functools
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+"""
+Profiling of notebook cells and src entry points (runs inside the notebook kernel)
+
+Only the kernel process is measured. Work done in worker processes (quantify_sharded
+shards, export_figure saves and bootstrap_fitting chunks with n_workers > 1) counts
+towards the wall time of the entry point that started it, but is not broken down, and
+the memory of the workers is not recorded.
+
+"""
+
+# Marker for cells added by the profiler, which are left out of the results
+MARKER = "# src-profiling"
+
+# Results, written to file after every cell
+profile = {"cells": [], "calls": {}}
+
+
+def process_peak_rss_mb() -> float:
+    """
+    Returns:
+        float: peak resident memory of this process so far (MB), or None if unavailable.
+            This is a high-water mark for the whole session, not for a single cell.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def timed(name: str, func):
+    """
+    Wraps a function to add its wall time to profile["calls"][name].
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            calls = profile["calls"].setdefault(name, {"count": 0, "wall_time": 0})
+            calls["count"] += 1
+            calls["wall_time"] += time.perf_counter() - start_time
+
+    return wrapper
+
+
+def instrument():
+    """
+    Wraps the expensive src entry points with timers.
+    """
+    import src
+    from src import dimer_model_fit, figures, rundowns_regression, stats
+
+    # Functions (patched where they are defined and where they are exported)
+    for module, name in [
+        (stats, "bootstrap"),
+        (stats, "bootstrap_effect_size_pd"),
+        (figures, "export_figure"),
+    ]:
+        wrapped = timed(name, getattr(module, name))
+        setattr(module, name, wrapped)
+        setattr(src, name, wrapped)
+
+    # Methods (bootstrap_fitting is where lazily evaluated fits do their work)
+    for cls, name in [
+        (dimer_model_fit.EnergiesConfidenceIntervalPaired, "run"),
+        (dimer_model_fit.EnergiesConfidenceIntervalPaired, "bootstrap_fitting"),
+        (dimer_model_fit.EnergiesConfidenceIntervalPaired, "profile_likelihood"),
+        (rundowns_regression.ExponentConfidenceInterval, "bootstrap_fitting"),
+    ]:
+        setattr(cls, name, timed("%s.%s" % (cls.__name__, name), getattr(cls, name)))
+
+    # Image quantification (optional dependency)
+    try:
+        from par_segmentation.model_flexi import ImageQuant2
+
+        from src import quantification
+    except ImportError:
+        return
+    ImageQuant2.quantify = timed("ImageQuant2.quantify", ImageQuant2.quantify)
+    for name in ["quantify_sharded", "quantify_manifest"]:
+        wrapped = timed(name, getattr(quantification, name))
+        setattr(quantification, name, wrapped)
+        setattr(src, name, wrapped)
+
+
+def install(path: str):
+    """
+    Starts profiling the current IPython kernel.
+
+    Records wall time and memory for each cell, and time spent in src entry points, and
+    writes the results to path as JSON after every cell. Memory is recorded as the peak
+    resident memory of the kernel so far (process_peak_rss_mb), and as how much the cell
+    raised it (peak_rss_increase_mb, zero for cells that stay within an earlier peak).
+
+    Args:
+        path (str): file to write results to
+    """
+    from IPython import get_ipython
+
+    instrument()
+    ip = get_ipython()
+    state = {}
+
+    def pre_run_cell(info):
+        state["start_time"] = time.perf_counter()
+        state["start_peak"] = process_peak_rss_mb()
+
+    def post_run_cell(result):
+        source = result.info.raw_cell if result.info is not None else ""
+        if source.startswith(MARKER) or "start_time" not in state:
+            return
+        peak = process_peak_rss_mb()
+        profile["cells"].append(
+            {
+                "wall_time": time.perf_counter() - state.pop("start_time"),
+                "process_peak_rss_mb": peak,
+                "peak_rss_increase_mb": (
+                    peak - state["start_peak"] if peak is not None else None
+                ),
+                "source": source.strip().splitlines()[0] if source.strip() else "",
+            }
+        )
+        with open(path, "w") as f:
+            json.dump(profile, f)
+
+    ip.events.register("pre_run_cell", pre_run_cell)
+    ip.events.register("post_run_cell", post_run_cell)
+
+
+def setup_source(path: str) -> str:
+    """
+    Source for a cell that starts profiling, to be run before the notebook.
+    """
+    return "%s\nimport src.profiling\nsrc.profiling.install(%r)" % (MARKER, path)
@@ -0,0 +1,339 @@
+import collections
+import json
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from par_segmentation import load_image
+from par_segmentation.model_flexi import ImageQuant2
+
+"""
+Parallel loading and quantification of embryo images
+
+"""
+
+
+def _files(paths: List[str], file: Union[str, List[str]]) -> List[str]:
+    # One file name per embryo (the same for all, or given per embryo)
+    if isinstance(file, str):
+        return [os.path.join(p, file) for p in paths]
+    if len(file) != len(paths):
+        raise ValueError("Need one file name per path")
+    return [os.path.join(p, f) for p, f in zip(paths, file)]
+
+
+def _load_embryo(img_path: str, roi_path: str) -> tuple:
+    return load_image(img_path), np.loadtxt(roi_path)
+
+
+def iter_embryos(
+    paths: List[str],
+    img_file: Union[str, List[str]] = "af_corrected.tif",
+    roi_file: Union[str, List[str]] = "ROI_fit.txt",
+    n_threads: int = 8,
+    prefetch: int = 32,
+) -> Iterator[tuple]:
+    """
+    Loads the image and ROI of each embryo using a pool of threads.
+
+    At most prefetch embryos are loaded ahead of the one being consumed, so memory use
+    stays bounded however many embryos there are.
+
+    Args:
+        paths (List[str]): embryo folders
+        img_file (str or List[str], optional): image file name, the same for all
+            embryos or one per embryo. Defaults to "af_corrected.tif".
+        roi_file (str or List[str], optional): ROI file name, the same for all embryos
+            or one per embryo. Defaults to "ROI_fit.txt".
+        n_threads (int, optional): number of loading threads. Defaults to 8.
+        prefetch (int, optional): maximum number of embryos loaded ahead.
+            Defaults to 32.
+
+    Yields:
+        tuple: (image, roi) for each embryo, in the order of paths
+    """
+    return _iter_files(
+        _files(paths, img_file), _files(paths, roi_file), n_threads, prefetch
+    )
+
+
+def _iter_files(img_paths, roi_paths, n_threads=8, prefetch=32):
+    with ThreadPoolExecutor(max_workers=n_threads) as pool:
+        pending = collections.deque()
+        for img_path, roi_path in zip(img_paths, roi_paths):
+            pending.append(pool.submit(_load_embryo, img_path, roi_path))
+            if len(pending) >= max(prefetch, 1):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def load_embryos(
+    paths: List[str],
+    img_file: Union[str, List[str]] = "af_corrected.tif",
+    roi_file: Union[str, List[str]] = "ROI_fit.txt",
+    n_threads: int = 8,
+    prefetch: int = 32,
+) -> tuple:
+    """
+    Loads the images and ROIs of a list of embryos in parallel (see iter_embryos).
+
+    Usage:
+        imgs, rois = load_embryos(df.Path.to_list())
+
+    Returns:
+        tuple: (list of images, list of ROIs), in the order of paths
+    """
+    return _load_files(
+        _files(paths, img_file), _files(paths, roi_file), n_threads, prefetch
+    )
+
+
+def _load_files(img_paths, roi_paths, n_threads=8, prefetch=32):
+    imgs, rois = [], []
+    for img, roi in _iter_files(img_paths, roi_paths, n_threads, prefetch):
+        imgs.append(img)
+        rois.append(roi)
+    return imgs, rois
+
+
+def _quantify_shard(
+    img_paths,
+    roi_paths,
+    ids,
+    n_threads,
+    iq_kwargs,
+    quantify_kwargs,
+    extra_columns,
+):
+    # Runs in a worker process: load and quantify one shard of embryos
+    imgs, rois = _load_files(img_paths, roi_paths, n_threads=n_threads)
+    iq = ImageQuant2(img=imgs, roi=rois, **iq_kwargs)
+    iq.quantify(**quantify_kwargs)
+    res = iq.compile_res(ids=ids, extra_columns=extra_columns)
+    return res, np.asarray(iq.losses)
+
+
+def quantify_sharded(
+    paths: List[str],
+    ids: Optional[list] = None,
+    img_file: Union[str, List[str]] = "af_corrected.tif",
+    roi_file: Union[str, List[str]] = "ROI_fit.txt",
+    n_workers: int = 4,
+    n_shards: Optional[int] = None,
+    n_threads: int = 4,
+    quantify_kwargs: Optional[dict] = None,
+    extra_columns: Optional[dict] = None,
+    **iq_kwargs,
+) -> tuple:
+    """
+    Quantifies embryos with ImageQuant2, split into shards that run in separate
+    processes.
+
+    Each worker loads the images of its shard itself (see load_embryos), so images are
+    never sent between processes. Embryos are fitted independently in
+    ImageQuant2.quantify, so results match a single ImageQuant2 run on all embryos to
+    within optimiser tolerance. This does not apply to the calibration methods, which
+    fit reference profiles shared by all embryos.
+
+    Usage:
+        res, losses = quantify_sharded(
+            paths=df.Path.to_list(),
+            ids=[str(x) for x in df["EmbryoID"].to_list()],
+            cytbg=cytbg,
+            membg=membg,
+        )
+
+    Args:
+        paths (List[str]): embryo folders
+        ids (list, optional): embryo IDs, passed to ImageQuant2.compile_res
+        img_file (str or List[str], optional): image file name, the same for all
+            embryos or one per embryo. Defaults to "af_corrected.tif".
+        roi_file (str or List[str], optional): ROI file name, the same for all embryos
+            or one per embryo. Defaults to "ROI_fit.txt".
+        n_workers (int, optional): number of processes. Defaults to 4.
+        n_shards (int, optional): number of shards. Defaults to n_workers.
+        n_threads (int, optional): loading threads per process. Defaults to 4.
+        quantify_kwargs (dict, optional): passed to ImageQuant2.quantify
+        extra_columns (dict, optional): passed to ImageQuant2.compile_res (one value per
+            embryo for each column)
+        **iq_kwargs: passed to ImageQuant2 (e.g. cytbg, membg)
+
+    Returns:
+        tuple: (results dataframe as returned by ImageQuant2.compile_res, losses array
+            of shape (n embryos, descent steps)), in the order of paths
+    """
+    n = len(paths)
+    quantify_kwargs = {} if quantify_kwargs is None else quantify_kwargs
+    img_files = _files(paths, img_file)
+    roi_files = _files(paths, roi_file)
+
+    # Contiguous shards, so results can be merged in order
+    n_shards = min(n_workers if n_shards is None else n_shards, n) or 1
+    shards = [s for s in np.array_split(np.arange(n), n_shards) if len(s) > 0]
+
+    def shard_args(s):
+        return (
+            [img_files[i] for i in s],
+            [roi_files[i] for i in s],
+            None if ids is None else [ids[i] for i in s],
+            n_threads,
+            iq_kwargs,
+            quantify_kwargs,
+            (
+                None
+                if extra_columns is None
+                else {k: [v[i] for i in s] for k, v in extra_columns.items()}
+            ),
+        )
+
+    # Run shards (spawned rather than forked, as jax is not fork-safe)
+    if n_workers > 1 and len(shards) > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+            futures = [pool.submit(_quantify_shard, *shard_args(s)) for s in shards]
+            outputs = [f.result() for f in futures]
+    else:
+        outputs = [_quantify_shard(*shard_args(s)) for s in shards]
+
+    # Merge in order (without ids, compile_res numbers frames from 0 in each shard)
+    if ids is None:
+        for s, o in zip(shards, outputs):
+            o[0]["Frame"] += s[0]
+    res = pd.concat([o[0] for o in outputs])
+    losses = np.concatenate([o[1] for o in outputs], axis=0)
+    return res, losses
+
+
+def quantify_manifest(
+    manifest: Union[str, pd.DataFrame],
+    output: str,
+    chunk_size: int = 50,
+    path_prefix: str = "",
+    img_file: Union[str, Callable] = "af_corrected.tif",
+    roi_file: Union[str, Callable] = "ROI_fit.txt",
+    calibration_factor: Optional[float] = None,
+    n_threads: int = 8,
+    quantify_kwargs: Optional[dict] = None,
+    **iq_kwargs,
+) -> int:
+    """
+    Quantifies the embryos in a manifest chunk by chunk, appending results to a CSV
+    file.
+
+    Only one chunk of images is held in memory at a time, so peak memory depends on
+    chunk_size rather than on the number of embryos. After each chunk, the completed
+    embryo IDs and the length of the output file are recorded in a progress file
+    (output + ".progress"). If a run is interrupted, running again with the same
+    arguments truncates any partly written chunk and carries on from the last completed
+    embryo. An output file with no progress file is overwritten, and if the output
+    file is missing or shorter than the progress file records, the run starts over
+    (with a warning). Delete the progress file to start from scratch.
+
+    Usage:
+        quantify_manifest(
+            "../../data/par2_nebd_embryos.csv",
+            "../../data/par2_nebd_quantification.csv",
+            path_prefix=raw_data_path,
+            roi_file=lambda r: "ROI_manual.txt" if r.Line == "n2" else "ROI_fit.txt",
+            calibration_factor=calibration_factor,
+            cytbg=cytbg,
+            membg=membg,
+        )
+
+    Args:
+        manifest (str or pd.DataFrame): embryos dataframe (or path to a CSV file) with
+            Path and EmbryoID columns
+        output (str): CSV file to append results to (columns as for
+            ImageQuant2.compile_res)
+        chunk_size (int, optional): number of embryos quantified together. Defaults
+            to 50.
+        path_prefix (str, optional): prepended to each path (e.g. raw_data_path)
+        img_file (str or Callable, optional): image file name, or a function of the
+            manifest row returning it. Defaults to "af_corrected.tif".
+        roi_file (str or Callable, optional): ROI file name, or a function of the
+            manifest row returning it. Defaults to "ROI_fit.txt".
+        calibration_factor (float, optional): if given, membrane signal is multiplied by
+            this
+        n_threads (int, optional): number of loading threads. Defaults to 8.
+        quantify_kwargs (dict, optional): passed to ImageQuant2.quantify
+        **iq_kwargs: passed to ImageQuant2 (e.g. cytbg, membg)
+
+    Returns:
+        int: number of embryos quantified in this call
+    """
+    df = pd.read_csv(manifest) if isinstance(manifest, str) else manifest
+    quantify_kwargs = {} if quantify_kwargs is None else quantify_kwargs
+
+    # Resume: drop anything written after the last completed chunk
+    done = _resume(output)
+    todo = df[~df["EmbryoID"].astype(str).isin(done)]
+
+    for start in range(0, len(todo), chunk_size):
+        chunk = todo.iloc[start : start + chunk_size]
+        rows = [r for _, r in chunk.iterrows()]
+        paths = [path_prefix + r.Path for r in rows]
+        imgs, rois = _load_files(
+            [os.path.join(p, _file(img_file, r)) for p, r in zip(paths, rows)],
+            [os.path.join(p, _file(roi_file, r)) for p, r in zip(paths, rows)],
+            n_threads=n_threads,
+        )
+
+        # Quantify
+        iq = ImageQuant2(img=imgs, roi=rois, **iq_kwargs)
+        iq.quantify(**quantify_kwargs)
+        ids = [str(x) for x in chunk["EmbryoID"]]
+        res = iq.compile_res(ids=ids)
+        if calibration_factor is not None:
+            res["Membrane signal"] *= calibration_factor
+        del iq, imgs, rois
+
+        # Append results, then record progress
+        write_header = not os.path.exists(output) or os.path.getsize(output) == 0
+        with open(output, "a", newline="") as f:
+            res.to_csv(f, index=False, header=write_header)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(output + ".progress", "a") as f:
+            f.write(json.dumps({"size": os.path.getsize(output), "ids": ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    return len(todo)
+
+
+def _file(file: Union[str, Callable], row: pd.Series) -> str:
+    return file(row) if callable(file) else file
+
+
+def _resume(output: str) -> set:
+    # Embryo IDs completed by previous runs (truncating files to the last of them)
+    done, size, records = set(), 0, []
+    if os.path.exists(output + ".progress"):
+        with open(output + ".progress") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # partly written record
+                records.append(line)
+                done.update(record["ids"])
+                size = record["size"]
+        # Output lost or cut short since progress was recorded, so start over
+        if records and (not os.path.exists(output) or os.path.getsize(output) < size):
+            warnings.warn(
+                "%s is missing or shorter than recorded in %s.progress; starting "
+                "over" % (output, output),
+                UserWarning,
+            )
+            done, size, records = set(), 0, []
+        with open(output + ".progress", "w") as f:
+            f.writelines(records)
+    if os.path.exists(output) and os.path.getsize(output) != size:
+        with open(output, "r+") as f:
+            f.truncate(size)
+    return done
@@ -1,25 +1,88 @@
+from functools import cached_property
+
 import numpy as np
 
-from .stats import bootstrap
+from .cache import ResultCache, get_cache, source_hash
+from .stats import bootstrap, bootstrap_indices, chunked_percentile
 
 
 def linear_model(x, a, b):
     return a * x + b
 
 
-def single_fit(cyt, mem):
-    p = np.polyfit(cyt, mem, 1)
+def single_fit(cyt, mem, w=None):
+    p = np.polyfit(cyt, mem, 1, w=w)
     return p
 
 
+def batch_fit(cyts, mems, w=None):
+    """
+    Closed-form degree-1 least squares fits for many datasets at once.
+
+    Equivalent to calling single_fit on each row.
+
+    Args:
+        cyts (np.array): x values, one row per dataset
+        mems (np.array): y values, one row per dataset
+        w (np.array, optional): weights, applied to the residuals as in np.polyfit
+            (i.e. 1/sigma). Defaults to None.
+
+    Returns:
+        np.array: slope and intercept for each row
+    """
+    w2 = np.ones_like(cyts) if w is None else np.asarray(w) ** 2
+    sw = w2.sum(axis=-1, keepdims=True)
+    x_mean = (w2 * cyts).sum(axis=-1, keepdims=True) / sw
+    y_mean = (w2 * mems).sum(axis=-1, keepdims=True) / sw
+    dx = cyts - x_mean
+    slope = (w2 * dx * (mems - y_mean)).sum(axis=-1) / (w2 * dx**2).sum(axis=-1)
+    intercept = y_mean[..., 0] - slope * x_mean[..., 0]
+    return np.stack([slope, intercept], axis=-1)
+
+
 class ExponentConfidenceInterval:
-    def __init__(self, df, whole_embryo=False, xmin=None, xmax=None, n_x=100):
+    """
+    Bootstrap confidence interval for the slope of log membrane vs log cytoplasmic
+    concentration.
+
+    Results are computed lazily and cached: the full-data fit (exponent_full, res_y) on
+    first access, and the bootstrap (exponents, all_fits_lower, all_fits_upper) only
+    when read. Changing n_bootstrap reuses existing bootstrap samples (extending or
+    truncating them), and changing interval only recomputes the percentiles.
+
+    Bootstrap samples are drawn from a RandomState seeded with seed. Without a seed,
+    they are drawn from the global numpy random state as in earlier versions (which
+    bootstrapped on initialisation), so results match those: the state is copied on
+    initialisation, and the global state is moved past the draws for n_bootstrap
+    samples.
+    """
+
+    def __init__(
+        self,
+        df,
+        whole_embryo=False,
+        xmin=None,
+        xmax=None,
+        n_x=100,
+        weights=None,
+        method="polyfit",
+        n_bootstrap=10000,
+        interval=95,
+        seed=None,
+        cache=None,
+    ):
         # Input
         self.cyts = np.log10(df.Cyt.to_numpy())
         self.mems = np.log10(
             df.Mem_post.to_numpy() if not whole_embryo else df.Mem_tot.to_numpy()
         )
         self.unipol = df.UniPol.tolist()
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        self.method = method
+        self.seed = seed
+        self.cache = get_cache(cache)
+        self._n_bootstrap = n_bootstrap
+        self._interval = interval
 
         # Set xmin and xmax if not provided
         xmin = xmin if xmin is not None else min(self.cyts)
@@ -27,31 +90,154 @@ class ExponentConfidenceInterval:
 
         self.res_x = np.linspace(xmin, xmax, n_x)
 
-        # Run
-        self.run()
+        # Without a seed, continue the global random state, leaving it as bootstrapping
+        # n_bootstrap samples on initialisation did
+        if seed is None:
+            self._global_state = np.random.get_state()
+            bootstrap_indices([self.cyts], niter=n_bootstrap)
+
+        # Bootstrap samples (extended on demand)
+        self.reset()
 
     def run(self, n_bootstrap=10000, interval=95):
-        # Analysing full dataset
-        popt_full = single_fit(self.cyts, self.mems)
-        self.res_y = linear_model(self.res_x, *popt_full)
-        self.exponent_full = popt_full[0]
-
-        # Bootstrapping
-        params = np.array(
-            bootstrap(
-                data=[
-                    np.c_[self.cyts, self.mems],
-                ],
-                func=lambda x: single_fit(x[0][:, 0], x[0][:, 1]),
-                niter=n_bootstrap,
-            )
+        # Discard cached results and recompute
+        self.reset()
+        self.n_bootstrap, self.interval = n_bootstrap, interval
+        self._bands
+
+    def reset(self):
+        # Discard cached results, including bootstrap samples
+        for name in ["popt_full", "_bands"]:
+            self.__dict__.pop(name, None)
+        self._rng = np.random.RandomState(self.seed)
+        if self.seed is None:
+            self._rng.set_state(self._global_state)
+        self._params = None
+
+    @property
+    def n_bootstrap(self):
+        return self._n_bootstrap
+
+    @n_bootstrap.setter
+    def n_bootstrap(self, value):
+        self._n_bootstrap = value
+        self.__dict__.pop("_bands", None)
+
+    @property
+    def interval(self):
+        return self._interval
+
+    @interval.setter
+    def interval(self, value):
+        self._interval = value
+        self.__dict__.pop("_bands", None)
+
+    # Full dataset
+
+    @cached_property
+    def popt_full(self):
+        return single_fit(self.cyts, self.mems, w=self.weights)
+
+    @property
+    def res_y(self):
+        return linear_model(self.res_x, *self.popt_full)
+
+    @property
+    def exponent_full(self):
+        return self.popt_full[0]
+
+    # Bootstrap
+
+    @property
+    def params(self):
+        # Bootstrap fits, loading from the on-disk cache if possible
+        n_existing = 0 if self._params is None else len(self._params)
+        if n_existing < self.n_bootstrap and self.cache is not None:
+            cached = self.cache.load(self.cache_key())
+            if cached is not None and len(cached["params"]) > n_existing:
+                # Continue the random state after the loaded samples
+                self._skip(len(cached["params"]) - n_existing)
+                self._params = cached["params"]
+                n_existing = len(self._params)
+
+        # Generate more samples if needed
+        if n_existing < self.n_bootstrap:
+            params = self.bootstrap_fitting(self.n_bootstrap - n_existing)
+            if self._params is not None:
+                params = np.r_[self._params, params]
+            self._params = params
+            if self.cache is not None:
+                self.cache.save(self.cache_key(), params=params)
+        return self._params[: self.n_bootstrap]
+
+    def cache_key(self):
+        # Key for the on-disk cache, from the data, fit options, n_bootstrap, seed
+        # and source
+        return ResultCache.key(
+            name=type(self).__name__,
+            cyts=self.cyts,
+            mems=self.mems,
+            weights=self.weights,
+            method=self.method,
+            n_bootstrap=int(self.n_bootstrap),
+            seed=self._seed_key(),
+            code=source_hash(__name__, bootstrap_indices.__module__),
         )
-        self.exponents = params[:, 0]
-
-        # Confidence interval
-        all_fits = np.zeros([n_bootstrap, len(self.res_x)])
-        for i, p in enumerate(params):
-            all_fits[i, :] = linear_model(self.res_x, *p)
-        self.all_fits_lower, self.all_fits_upper = np.percentile(
-            all_fits, [(100 - interval) / 2, 50 + (interval / 2)], axis=0
+
+    def _skip(self, n):
+        # Move the random state past n bootstrap samples (e.g. loaded from the cache)
+        bootstrap_indices([self.cyts], niter=n, rng=self._rng)
+
+    def _seed_key(self):
+        # The seed, or the copied global random state (key and position) if not seeded
+        if self.seed is None:
+            return np.append(self._global_state[1], self._global_state[2])
+        return int(self.seed)
+
+    def bootstrap_fitting(self, n):
+        w = np.ones(len(self.cyts)) if self.weights is None else self.weights
+        if self.method == "vectorized":
+            # Closed-form fits to all bootstrap samples at once
+            (inds,) = bootstrap_indices([self.cyts], niter=n, rng=self._rng)
+            return batch_fit(
+                self.cyts[inds],
+                self.mems[inds],
+                w=None if self.weights is None else w[inds],
+            )
+        elif self.method == "polyfit":
+            return np.array(
+                bootstrap(
+                    data=[
+                        np.c_[self.cyts, self.mems, w],
+                    ],
+                    func=lambda x: single_fit(
+                        x[0][:, 0],
+                        x[0][:, 1],
+                        w=None if self.weights is None else x[0][:, 2],
+                    ),
+                    niter=n,
+                    rng=self._rng,
+                )
+            )
+        raise ValueError('method must be "polyfit" or "vectorized"')
+
+    @property
+    def exponents(self):
+        return self.params[:, 0]
+
+    @cached_property
+    def _bands(self):
+        # Confidence interval (all fits evaluated as a single matrix product)
+        return chunked_percentile(
+            lambda p: p @ np.vstack([self.res_x, np.ones(len(self.res_x))]),
+            self.params,
+            [(100 - self.interval) / 2, 50 + (self.interval / 2)],
         )
+
+    @property
+    def all_fits_lower(self):
+        return self._bands[0]
+
+    @property
+    def all_fits_upper(self):
+        return self._bands[1]
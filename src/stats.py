@@ -1,33 +1,73 @@
+import contextlib
 import os
-from typing import Callable, List
+import tempfile
+from typing import Callable, List, Optional, Union
 
 import numpy as np
 import pandas as pd
 
+from .storage import replacement_mode
 
-def bootstrap(data: List[np.array], func: Callable, niter: int = 10000) -> list:
+try:
+    import fcntl
+except ImportError:  # Windows
+    import msvcrt
+
+    fcntl = None
+
+
+def bootstrap(
+    data: List[np.array],
+    func: Callable,
+    niter: int = 10000,
+    batch: bool = False,
+    batch_func: Optional[Callable] = None,
+    rng: Optional[np.random.RandomState] = None,
+) -> Union[list, np.ndarray]:
     """
     Basic function for doing bootstrap analysis.
 
+    In batch mode, resample indices for all iterations are drawn up front as one
+    (niter, len(d)) integer matrix per dataset. If batch_func is provided, it is called
+    once on the list of resampled (niter, len(d)) arrays and should reduce along the
+    last axis (e.g. lambda x: np.mean(x[1], axis=-1) - np.mean(x[0], axis=-1)).
+    Otherwise func is called once per row as in the default mode. Indices are drawn
+    in the same order as the default mode, so seeded output is identical.
+
     Args:
         data (List[np.array]): data, list of numpy arrays
         func (Callable): will perform this function on the data to calculate output
             e.g. lambda x: np.mean(x[1]) - np.mean(x[0])
         niter (int, optional): number of bootstrap samples. Defaults to 10000.
+        batch (bool, optional): draw all resamples at once. Defaults to False.
+        batch_func (Callable, optional): axis-wise version of func, used in batch
+            mode. Defaults to None.
+        rng (np.random.RandomState, optional): random state to draw from. Defaults to
+            None (the global numpy random state).
 
     Returns:
-        np.array: ninter bootstrap values
+        np.array: ninter bootstrap values (list if not in batch mode)
     """
 
+    if batch:
+        # Resampled data, one (niter, len(d)) array per dataset
+        samples = [d[i] for d, i in zip(data, bootstrap_indices(data, niter, rng))]
+
+        # Perform function on all samples at once, or fall back to one row at a time
+        if batch_func is not None:
+            return np.asarray(batch_func(samples))
+        return np.array([func([s[i] for s in samples]) for i in range(niter)])
+
     # Results containter
     output = []
+    rng = np.random if rng is None else rng
 
     # ninter bootstraps
     for i in range(niter):
         # Loop through datasets, taking a subsample of each with replacement
         _data = []
         for d in data:
-            d_sample = d[np.random.choice(range(len(d)), len(d))]
+            d_sample = d[rng.choice(range(len(d)), len(d))]
             _data.append(d_sample)
 
         # Perform function on _data to calculate output
@@ -36,6 +76,99 @@ def bootstrap(data: List[np.array], func: Callable, niter: int = 10000) -> list:
     return output
 
 
+def bootstrap_indices(
+    data: List[np.array],
+    niter: int = 10000,
+    rng: Optional[np.random.RandomState] = None,
+) -> List[np.ndarray]:
+    """
+    Draws resample indices for all bootstrap iterations in a single call.
+
+    Draws are made in the same order as the loop in bootstrap (iteration by iteration,
+    dataset by dataset), so the indices match it for a given global seed.
+
+    Args:
+        data (List[np.array]): data, list of numpy arrays
+        niter (int, optional): number of bootstrap samples. Defaults to 10000.
+        rng (np.random.RandomState, optional): random state to draw from. Defaults to
+            None (the global numpy random state).
+
+    Returns:
+        List[np.ndarray]: one (niter, len(d)) integer array per dataset
+    """
+
+    # Upper bound for every draw, laid out as one row per iteration
+    sizes = [len(d) for d in data]
+    highs = np.tile(np.repeat(sizes, sizes), (niter, 1))
+
+    # Draw and split back into datasets
+    rng = np.random if rng is None else rng
+    inds = rng.randint(0, highs) if highs.size else highs
+    return np.split(inds, np.cumsum(sizes)[:-1], axis=1)
+
+
+def chunked_percentile(
+    func: Callable, params: np.array, q: List[float], chunk_size: int = None
+) -> np.array:
+    """
+    Percentiles across bootstrap samples of func(params), computed column-wise.
+
+    func maps an (n, n_params) array of parameters to an (n, n_x) array (e.g. model
+    curves for each bootstrap sample). If chunk_size is given, func is evaluated on
+    chunk_size rows at a time, and only the tails of each column needed for the
+    requested percentiles are kept, so the full (n, n_x) array is never materialised.
+
+    Args:
+        func (Callable): function of a parameter array, returning one row per sample
+        params (np.array): parameters, one row per bootstrap sample
+        q (List[float]): percentiles to compute (0-100)
+        chunk_size (int, optional): number of samples to evaluate at once. Defaults to
+            None (evaluate all samples at once).
+
+    Returns:
+        np.array: one row per percentile (linear interpolation, as np.percentile)
+    """
+
+    if chunk_size is None:
+        return np.percentile(func(params), q, axis=0)
+
+    # Rank positions of each percentile, and the number of values needed in each tail
+    n = len(params)
+    positions = (n - 1) * np.asarray(q) / 100
+    ranks = np.floor(positions).astype(int)
+    upper = positions > (n - 1) / 2
+    k_low = min(n, max([r + 2 for r, u in zip(ranks, upper) if not u], default=0))
+    k_high = min(n, max([n - r for r, u in zip(ranks, upper) if u], default=0))
+
+    # Stream through chunks, keeping the k_low smallest and k_high largest per column
+    low, high = None, None
+    for i in range(0, n, chunk_size):
+        chunk = func(params[i : i + chunk_size])
+        low = _tail(chunk if low is None else np.r_[low, chunk], k_low)
+        high = _tail(chunk if high is None else np.r_[high, chunk], k_high, True)
+    low, high = np.sort(low, axis=0), np.sort(high, axis=0)
+
+    # Interpolate between neighbouring order statistics
+    output = []
+    for p, r, u in zip(positions, ranks, upper):
+        tail, offset = (high, n - len(high)) if u else (low, 0)
+        a = tail[r - offset]
+        b = tail[min(r + 1, n - 1) - offset]
+        output.append(a + (b - a) * (p - r))
+    return np.array(output)
+
+
+def _tail(values: np.array, k: int, largest: bool = False) -> np.array:
+    # k smallest (or largest) values of each column, unsorted
+    if k >= len(values):
+        return values
+    if k == 0:
+        return values[:0]
+    if largest:
+        return np.partition(values, len(values) - k, axis=0)[len(values) - k :]
+    return np.partition(values, k - 1, axis=0)[:k]
+
+
 def bootstrap_effect_size_pd(
     data: pd.DataFrame, x: str, y: str, a: str, b: str, niter: int = 10000
 ) -> np.array:
@@ -64,18 +197,84 @@ def bootstrap_effect_size_pd(
     effect_size = np.mean(data_b) - np.mean(data_a)
 
     # Perform bootstrap analysis
-    probability_distribution = np.array(
-        bootstrap(
-            data=[data_a, data_b],
-            func=lambda x: np.mean(x[1]) - np.mean(x[0]),
-            niter=niter,
-        )
+    probability_distribution = bootstrap(
+        data=[data_a, data_b],
+        func=lambda x: np.mean(x[1]) - np.mean(x[0]),
+        niter=niter,
+        batch=True,
+        batch_func=lambda x: np.mean(x[1], axis=-1) - np.mean(x[0], axis=-1),
     )
 
     return effect_size, probability_distribution, (sample_size_a, sample_size_b)
 
 
-def add_stats_table_row(
+def bootstrap_effect_sizes_pd(
+    data: pd.DataFrame,
+    x: str,
+    y: str,
+    contrasts: List[tuple],
+    niter: int = 10000,
+    rng: Optional[np.random.RandomState] = None,
+) -> pd.DataFrame:
+    """
+    Effect sizes for several contrasts between categories of the same data.
+
+    Each category is resampled once (vectorised, see bootstrap), and its bootstrap means
+    are reused for every contrast involving it, rather than resampling both categories
+    again for each contrast as repeated calls to bootstrap_effect_size_pd would.
+
+    Args:
+        data (pd.Dataframe): pandas dataframe containing data
+        x (str): name of x variable (categorical)
+        y (str): name of y variable (continuous)
+        contrasts (List[tuple]): (a, b) pairs of categories of x. Effect sizes are B-A
+        niter (int): number of bootstrap samples
+        rng (np.random.RandomState, optional): random state to draw from. Defaults to
+            None (the global numpy random state).
+
+    Returns:
+        pd.DataFrame: one row per contrast, with columns Sample A, Sample B, Sample size
+            A, Sample size B, Effect size (B-A), 95% CI (lower) and 95% CI (upper) (see
+            StatsTable.add_rows)
+    """
+
+    # Extract data from dataframe, once per category
+    groups = list(dict.fromkeys(g for contrast in contrasts for g in contrast))
+    values = {g: data[data[x] == g][y].to_numpy() for g in groups}
+    for g in groups:
+        if len(values[g]) == 0:
+            raise ValueError("No data for %s == %r" % (x, g))
+
+    # Bootstrap means of each category, (n_groups, niter)
+    means = bootstrap(
+        data=[values[g] for g in groups],
+        func=None,
+        niter=niter,
+        batch=True,
+        batch_func=lambda samples: [np.mean(s, axis=-1) for s in samples],
+        rng=rng,
+    )
+    index = {g: i for i, g in enumerate(groups)}
+
+    # Effect size and confidence interval of each contrast
+    rows = []
+    for a, b in contrasts:
+        probability_distribution = means[index[b]] - means[index[a]]
+        rows.append(
+            {
+                "Sample A": a,
+                "Sample B": b,
+                "Sample size A": len(values[a]),
+                "Sample size B": len(values[b]),
+                "Effect size (B-A)": np.mean(values[b]) - np.mean(values[a]),
+                "95% CI (lower)": np.percentile(probability_distribution, 2.5),
+                "95% CI (upper)": np.percentile(probability_distribution, 97.5),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def stats_table_row(
     figure: str,
     panel: str,
     sample_a: str,
@@ -85,20 +284,23 @@ def add_stats_table_row(
     sample_size: tuple,
     probability_distribution: np.array,
     key: str,
-    df_path: str = "../../../data/stats_table.csv",
-):
-    # Import existing stats table
-    if os.path.exists(df_path):
-        df = pd.read_csv(df_path)
-    else:
-        df = pd.DataFrame()
+) -> dict:
+    """
+    Formats a row of the stats table (see add_stats_table_row).
+    """
+    ci = (
+        np.percentile(probability_distribution, 2.5),
+        np.percentile(probability_distribution, 97.5),
+    )
+    return _table_row(
+        figure, panel, sample_a, sample_b, measure, effect_size, sample_size, ci, key
+    )
 
-    # Delete row if row already exists
-    if "Key" in df.columns and not len(df.index[df["Key"] == key].tolist()) == 0:
-        df = df.drop(df.index[df["Key"] == key].tolist()[0])
 
-    # Create row
-    row = {
+def _table_row(
+    figure, panel, sample_a, sample_b, measure, effect_size, sample_size, ci, key
+) -> dict:
+    return {
         "Figure": figure,
         "Panel": panel,
         "Sample A": sample_a,
@@ -107,22 +309,201 @@ def add_stats_table_row(
         "Sample size A": sample_size[0],
         "Sample size B": sample_size[1],
         "Effect size (B-A)": "{:.3g}".format(effect_size),
-        "95% CI (lower)": "{:.3g}".format(np.percentile(probability_distribution, 2.5)),
-        "95% CI (upper)": "{:.3g}".format(
-            np.percentile(probability_distribution, 97.5)
-        ),
+        "95% CI (lower)": "{:.3g}".format(ci[0]),
+        "95% CI (upper)": "{:.3g}".format(ci[1]),
         "Key": key,
     }
 
-    # Add row to dataframe
-    df = pd.concat([df, pd.DataFrame(row, index=[0])], axis=0, ignore_index=True)
 
-    # Format columns
-    df["Sample size A"] = df["Sample size A"].astype(int)
-    df["Sample size B"] = df["Sample size B"].astype(int)
+class StatsTable:
+    """
+    Batched writer for the stats table.
+
+    Rows are upserted by key in memory, and written to file in one go when the session
+    ends (or on flush). Writing locks the file, re-reads it, replaces rows with matching
+    keys, and saves through a temporary file and rename (keeping the file's
+    permissions), so notebooks running in parallel can safely write to the same table.
+
+    Rows are also written if the session ends with an error, as each row is complete
+    when added (and add_stats_table_row wrote rows one at a time before sessions were
+    added).
+
+    While a session is open, add_stats_table_row calls for the same file are added
+    to it.
+
+    Usage:
+        with StatsTable() as table:
+            table.add_row(figure="2", panel="K", ..., key="uWOeuWhzPs")
+    """
+
+    # Open sessions (most recent last)
+    _active = []
+
+    def __init__(self, df_path: str = "../../../data/stats_table.csv"):
+        self.df_path = df_path
+        self.rows = {}
+
+    def __enter__(self):
+        StatsTable._active.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Write rows added before any error (see class docstring)
+        StatsTable._active.remove(self)
+        self.flush()
+
+    @classmethod
+    def active(cls, df_path: str):
+        # Most recently opened session for df_path, if any
+        for table in reversed(cls._active):
+            if os.path.abspath(table.df_path) == os.path.abspath(df_path):
+                return table
+        return None
+
+    def add_row(self, **kwargs):
+        """
+        Adds a row, replacing any existing row with the same key. Arguments as for
+        add_stats_table_row (except df_path).
+        """
+        self._add(stats_table_row(**kwargs))
+
+    def add_rows(
+        self,
+        effect_sizes: pd.DataFrame,
+        figure: str,
+        panel: str,
+        measure: str,
+        keys: List[str],
+        sample_names: Optional[dict] = None,
+    ):
+        """
+        Adds the output of bootstrap_effect_sizes_pd, one row per contrast.
+
+        Args:
+            effect_sizes (pd.DataFrame): output of bootstrap_effect_sizes_pd
+            figure (str): figure, for all rows
+            panel (str): panel, for all rows
+            measure (str): measure, for all rows
+            keys (List[str]): key for each row
+            sample_names (dict, optional): names to use in the table for each category,
+                e.g. {"WT": "PAR-2(WT)"}. Defaults to the category names.
+        """
+        if len(keys) != len(effect_sizes):
+            raise ValueError("Need one key per row")
+        sample_names = {} if sample_names is None else sample_names
+        for key, (_, r) in zip(keys, effect_sizes.iterrows()):
+            self._add(
+                _table_row(
+                    figure=figure,
+                    panel=panel,
+                    sample_a=sample_names.get(r["Sample A"], r["Sample A"]),
+                    sample_b=sample_names.get(r["Sample B"], r["Sample B"]),
+                    measure=measure,
+                    effect_size=r["Effect size (B-A)"],
+                    sample_size=(r["Sample size A"], r["Sample size B"]),
+                    ci=(r["95% CI (lower)"], r["95% CI (upper)"]),
+                    key=key,
+                )
+            )
 
-    # Order dataframe
-    df = df.sort_values(by=["Figure", "Panel"])
+    def _add(self, row: dict):
+        self.rows.pop(row["Key"], None)
+        self.rows[row["Key"]] = row
 
-    # Save dataframe
-    df.to_csv(df_path, index=False)
+    def flush(self):
+        """
+        Writes pending rows to file.
+        """
+        if not self.rows:
+            return
+        with _file_lock(self.df_path + ".lock"):
+            # Import existing stats table, minus rows that are being replaced
+            if os.path.exists(self.df_path):
+                df = pd.read_csv(self.df_path)
+            else:
+                df = pd.DataFrame()
+            if "Key" in df.columns:
+                df = df[~df["Key"].isin(self.rows.keys())]
+
+            # Add rows to dataframe
+            df = pd.concat(
+                [df, pd.DataFrame(list(self.rows.values()))],
+                axis=0,
+                ignore_index=True,
+            )
+
+            # Format columns
+            df["Sample size A"] = df["Sample size A"].astype(int)
+            df["Sample size B"] = df["Sample size B"].astype(int)
+
+            # Order dataframe
+            df = df.sort_values(by=["Figure", "Panel"])
+
+            # Save dataframe (write to a temporary file, then rename)
+            fd, tmp = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(self.df_path)), suffix=".tmp"
+            )
+            try:
+                with os.fdopen(fd, "w", newline="") as f:
+                    df.to_csv(f, index=False)
+                os.chmod(tmp, replacement_mode(self.df_path))
+                os.replace(tmp, self.df_path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+        self.rows = {}
+
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    # Exclusive lock on path (created if needed) for the duration of the block
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def add_stats_table_row(
+    figure: str,
+    panel: str,
+    sample_a: str,
+    sample_b: str,
+    measure: str,
+    effect_size: float,
+    sample_size: tuple,
+    probability_distribution: np.array,
+    key: str,
+    df_path: str = "../../../data/stats_table.csv",
+):
+    """
+    Adds a row to the stats table, replacing any existing row with the same key.
+
+    If a StatsTable session is open for df_path, the row is added to it and written when
+    the session ends. Otherwise the table is updated immediately.
+    """
+    row = dict(
+        figure=figure,
+        panel=panel,
+        sample_a=sample_a,
+        sample_b=sample_b,
+        measure=measure,
+        effect_size=effect_size,
+        sample_size=sample_size,
+        probability_distribution=probability_distribution,
+        key=key,
+    )
+    table = StatsTable.active(df_path)
+    if table is not None:
+        table.add_row(**row)
+    else:
+        with StatsTable(df_path) as table:
+            table.add_row(**row)
@@ -0,0 +1,269 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+"""
+Columnar storage for per-position quantification tables
+
+"""
+
+
+class QuantificationTable:
+    """
+    Quantification results (one row per embryo x position) stored as dense arrays.
+
+    Each value column is an (n_embryos, n_positions) array, padded with NaN for embryos
+    with fewer positions than the longest (see lengths). When loaded with load_table the
+    arrays are memory-mapped, so only the parts that are used are read from disk.
+
+    Usage:
+        table = read_quantification("../../../data/ph_quantification.csv")
+        mems = table["Membrane signal"]  # (n_embryos, n_positions)
+        mems_embryo = table.values("Membrane signal", table.index(1556901861))
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        lengths: np.ndarray,
+        columns: dict,
+        id_column: str = "EmbryoID",
+        position_column: str = "Position",
+    ):
+        """
+        Args:
+            ids (np.ndarray): embryo IDs, (n_embryos,)
+            lengths (np.ndarray): number of positions of each embryo, (n_embryos,)
+            columns (dict): value columns, name -> (n_embryos, n_positions) array
+            id_column (str, optional): name of the ID column. Defaults to "EmbryoID".
+            position_column (str, optional): name of the position column. Defaults to
+                "Position".
+        """
+        self.ids = ids
+        self.lengths = lengths
+        self.columns = columns
+        self.id_column = id_column
+        self.position_column = position_column
+        self._index = None
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, id_column: Optional[str] = None
+    ) -> "QuantificationTable":
+        """
+        Builds a table from a dataframe in the format returned by
+        ImageQuant2.compile_res.
+
+        Rows of each embryo must be contiguous, with positions 0, 1, 2, ... in order.
+
+        Args:
+            df (pd.DataFrame): quantification results
+            id_column (str, optional): name of the ID column. Defaults to the first
+                column.
+        """
+        id_column = df.columns[0] if id_column is None else id_column
+        position_column = "Position"
+        value_columns = [c for c in df.columns if c not in (id_column, position_column)]
+
+        # Embryo boundaries
+        ids_all = df[id_column].to_numpy()
+        positions = df[position_column].to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids_all[1:] != ids_all[:-1]])
+        lengths = np.diff(np.r_[starts, len(df)])
+        ids = ids_all[starts]
+        if len(np.unique(ids)) != len(ids) or not np.array_equal(
+            positions, np.arange(len(df)) - np.repeat(starts, lengths)
+        ):
+            raise ValueError(
+                "Rows of each embryo must be contiguous, with positions 0, 1, 2, ..."
+            )
+
+        # Scatter values into padded arrays
+        rows = np.repeat(np.arange(len(ids)), lengths)
+        columns = {}
+        for c in value_columns:
+            values = df[c].to_numpy(dtype=float)
+            array = np.full((len(ids), lengths.max(initial=0)), np.nan)
+            array[rows, positions] = values
+            columns[c] = array
+        return cls(ids, lengths, columns, id_column, position_column)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index(self, embryo_id) -> int:
+        """
+        Returns:
+            int: row of the arrays holding embryo_id
+        """
+        if self._index is None:
+            self._index = {k: i for i, k in enumerate(self.ids.tolist())}
+        return self._index[embryo_id]
+
+    def values(self, column: str, i: int) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: values of column for the embryo in row i, without padding (a
+                view, not a copy)
+        """
+        return self.columns[column][i, : self.lengths[i]]
+
+    def select(self, embryo_ids) -> "QuantificationTable":
+        """
+        Returns:
+            QuantificationTable: table with only the given embryos, in the given order
+        """
+        rows = np.array([self.index(k) for k in embryo_ids], dtype=int)
+        columns = {c: a[rows] for c, a in self.columns.items()}
+        return QuantificationTable(
+            self.ids[rows],
+            self.lengths[rows],
+            columns,
+            self.id_column,
+            self.position_column,
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns:
+            pd.DataFrame: table in long format (as returned by ImageQuant2.compile_res)
+        """
+        rows = np.repeat(np.arange(len(self.ids)), self.lengths)
+        positions = np.arange(len(rows)) - np.repeat(
+            np.cumsum(self.lengths) - self.lengths, self.lengths
+        )
+        df = {self.id_column: self.ids[rows], self.position_column: positions}
+        for c, a in self.columns.items():
+            df[c] = a[rows, positions]
+        return pd.DataFrame(df)
+
+    def to_csv(self, path: str):
+        """
+        Exports the table as CSV, in the same format as ImageQuant2.compile_res output.
+        """
+        self.to_frame().to_csv(path, index=False)
+
+
+def save_table(table, path: str):
+    """
+    Saves a quantification table as a folder of .npy files that can be memory-mapped.
+
+    Args:
+        table (QuantificationTable or pd.DataFrame): table to save
+        path (str): folder to save to (replaced if it exists)
+    """
+    if isinstance(table, pd.DataFrame):
+        table = QuantificationTable.from_frame(table)
+
+    # IDs read from CSV files as strings are object arrays, which np.load won't read
+    # without pickle, so are saved as a string (or numeric) array
+    ids = np.array(table.ids.tolist()) if table.ids.dtype == object else table.ids
+
+    # Write to a temporary folder (with the permissions of a normal folder), then move
+    # into place
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        os.chmod(tmp, replacement_mode(path, directory=True))
+        np.save(os.path.join(tmp, "ids.npy"), ids)
+        np.save(os.path.join(tmp, "lengths.npy"), table.lengths)
+        for i, array in enumerate(table.columns.values()):
+            np.save(os.path.join(tmp, "column%d.npy" % i), array)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(
+                {
+                    "id_column": table.id_column,
+                    "position_column": table.position_column,
+                    "columns": list(table.columns),
+                },
+                f,
+            )
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_table(path: str, mmap: bool = True) -> QuantificationTable:
+    """
+    Loads a table saved with save_table.
+
+    Args:
+        path (str): folder the table was saved to
+        mmap (bool, optional): memory-map the arrays (read-only) rather than reading
+            them into memory. Defaults to True.
+    """
+    mmap_mode = "r" if mmap else None
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {
+        c: np.load(os.path.join(path, "column%d.npy" % i), mmap_mode=mmap_mode)
+        for i, c in enumerate(meta["columns"])
+    }
+    return QuantificationTable(
+        np.load(os.path.join(path, "ids.npy")),
+        np.load(os.path.join(path, "lengths.npy")),
+        columns,
+        meta["id_column"],
+        meta["position_column"],
+    )
+
+
+def read_quantification(
+    csv_path: str, bundle_path: Optional[str] = None, mmap: bool = True
+) -> QuantificationTable:
+    """
+    Loads a quantification CSV file through a columnar copy stored next to it.
+
+    The first call parses the CSV and saves it with save_table (to the CSV path with
+    .csv replaced by .bundle). Later calls load the saved copy directly, until the CSV
+    file is modified. The CSV file remains the published version of the data.
+
+    Args:
+        csv_path (str): quantification CSV file (e.g. ph_quantification.csv)
+        bundle_path (str, optional): folder for the columnar copy
+        mmap (bool, optional): memory-map the arrays. Defaults to True.
+    """
+    if bundle_path is None:
+        bundle_path = os.path.splitext(csv_path)[0] + ".bundle"
+    meta_path = os.path.join(bundle_path, "meta.json")
+    if not (
+        os.path.exists(meta_path)
+        and os.path.getmtime(meta_path) >= os.path.getmtime(csv_path)
+    ):
+        save_table(pd.read_csv(csv_path), bundle_path)
+    return load_table(bundle_path, mmap=mmap)
+
+
+def replacement_mode(path: str, directory: bool = False) -> int:
+    """
+    Permissions for a file or folder written elsewhere and moved to path.
+
+    Files and folders made by tempfile can only be accessed by their owner, so are given
+    these before being moved into place: the permissions of path if it exists, otherwise
+    the defaults for a new file or folder (i.e. respecting the umask).
+
+    Args:
+        path (str): file or folder that will be replaced
+        directory (bool, optional): whether path is a folder. Defaults to False.
+
+    Returns:
+        int: permission bits, for os.chmod
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return (0o777 if directory else 0o666) & ~umask
@@ -0,0 +1,169 @@
+import collections
+import functools
+import hashlib
+import warnings
+
+import numpy as np
+
+"""
+Beeswarm layout for categorical scatter plots
+
+Points are laid out as in seaborn's swarmplot: in order of value, each point is placed
+as close to the centre line as possible without overlapping those already placed. Only
+points within one marker diameter (in value) can overlap, so a sweep through the sorted
+values only compares each point with a short window of its predecessors.
+
+Layouts are computed when the figure is drawn (so they fit the final axis size and
+limits), in points rather than pixels (so they don't depend on dpi), and cached.
+
+"""
+
+# Cache of layouts, keyed on data, axis size and limits, and marker size
+cache_size = 256
+_cache = collections.OrderedDict()
+
+
+def beeswarm(y: np.ndarray, d: float) -> np.ndarray:
+    """
+    Horizontal offsets that place points of diameter d without overlaps.
+
+    Args:
+        y (np.ndarray): point positions along the value axis (same units as d)
+        d (float): point diameter
+
+    Returns:
+        np.ndarray: offset of each point from the centre line, in the units of d
+    """
+    y = np.asarray(y, dtype=float)
+    order = np.argsort(y, kind="stable")
+    ys = y[order]
+    xs = np.zeros(len(ys))
+    start = 0
+    for i in range(1, len(ys)):
+        # Neighbours: placed points less than d below
+        while ys[i] - ys[start] >= d:
+            start += 1
+        if start == i:
+            continue
+        nx, dy = xs[start:i], ys[i] - ys[start:i]
+
+        # Candidates: the centre, or just touching a neighbour on either side
+        # (alternately left and right first), closest to the centre first
+        dx = np.sqrt(np.maximum(d**2 - dy**2, 0)) * 1.05
+        sides = np.where(np.arange(len(nx)) % 2, 1, -1)[:, np.newaxis] * [1, -1]
+        candidates = np.r_[0, (nx[:, np.newaxis] + sides * dx[:, np.newaxis]).ravel()]
+        candidates = candidates[np.argsort(np.abs(candidates), kind="stable")]
+
+        # First candidate clear of all neighbours (the outermost always is)
+        clear = np.all((candidates[:, np.newaxis] - nx) ** 2 + dy**2 >= d**2, axis=1)
+        xs[i] = candidates[np.argmax(clear)]
+
+    offsets = np.empty(len(y))
+    offsets[order] = xs
+    return offsets
+
+
+def swarm_offsets(ax, x: float, y: np.ndarray, d: float) -> np.ndarray:
+    """
+    Beeswarm offsets for values y at category position x on an axis, in points.
+
+    Results are cached, keyed on the data, the size of the axis, the value axis limits
+    and scale, and the marker diameter.
+
+    Args:
+        ax: axis
+        x (float): category position (data coordinates)
+        y (np.ndarray): values (data coordinates)
+        d (float): point diameter (points)
+
+    Returns:
+        np.ndarray: horizontal offset of each point (points)
+    """
+    y = np.ascontiguousarray(y, dtype=float)
+    key = (
+        hashlib.sha1(y.tobytes()).hexdigest(),
+        tuple(np.round(ax.bbox.size * 72 / ax.figure.dpi, 6)),
+        ax.get_ylim(),
+        ax.get_yscale(),
+        d,
+    )
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    # Lay out in points
+    scale = 72 / ax.figure.dpi
+    y_points = ax.transData.transform(np.c_[np.full(len(y), x), y])[:, 1] * scale
+    offsets = beeswarm(y_points, d)
+    _cache[key] = offsets
+    if len(_cache) > cache_size:
+        _cache.popitem(last=False)
+    return offsets
+
+
+def swarm(
+    ax,
+    x: float,
+    y: np.ndarray,
+    colors,
+    width: float = 0.8,
+    s: float = 25,
+    linewidth: float = 0,
+    edgecolor="gray",
+    marker="o",
+    transform=None,
+):
+    """
+    Draws values as a beeswarm centred on a category position, as one scatter.
+
+    Args:
+        ax: axis
+        x (float): category position (data coordinates)
+        y (np.ndarray): values
+        colors: color of each point (or one color for all)
+        width (float, optional): maximum width of the swarm (data coordinates). Points
+            that don't fit are placed at the edge, with a warning. Defaults to 0.8.
+        s (float, optional): marker size (points^2). Defaults to 25.
+        linewidth (float, optional): marker edge width. Defaults to 0.
+        edgecolor (optional): marker edge color. Defaults to "gray".
+        marker (str, optional): marker style. Defaults to "o".
+        transform (optional): transform for the points, e.g. to shift them sideways.
+            Defaults to ax.transData.
+
+    Returns:
+        PathCollection: the points
+    """
+    y = np.asarray(y, dtype=float)
+    kwargs = {} if transform is None else {"transform": transform}
+    points = ax.scatter(
+        np.full(len(y), x),
+        y,
+        c=colors,
+        s=s,
+        linewidth=linewidth,
+        edgecolors=edgecolor,
+        marker=marker,
+        **kwargs,
+    )
+    d = np.sqrt(s) + linewidth
+
+    # Lay out when drawn (a partial rather than a closure, so figures can be pickled)
+    points.draw = functools.partial(_draw_swarm, points, ax, x, y, width, d)
+    return points
+
+
+def _draw_swarm(points, ax, x, y, width, d, renderer):
+    # Lay out for the current axis size and limits, then draw
+    offsets = swarm_offsets(ax, x, y, d)
+    x_scale = ax.transData.transform([[x, 0], [x + 1, 0]])[:, 0] @ [-1, 1]
+    x_scale *= 72 / ax.figure.dpi  # points per unit
+    limit = width / 2 * x_scale
+    if np.any(np.abs(offsets) > limit):
+        warnings.warn(
+            "%.1f%% of the points cannot be placed; you may want to decrease the "
+            "size of the markers" % (100 * np.mean(np.abs(offsets) > limit)),
+            UserWarning,
+        )
+        offsets = np.clip(offsets, -limit, limit)
+    points.set_offsets(np.c_[x + offsets / x_scale, y])
+    type(points).draw(points, renderer)
@@ -0,0 +1,173 @@
+from typing import Optional
+
+import numpy as np
+from scipy.integrate import odeint
+
+"""
+Three compartment model (cytoplasm, membrane and internal membranes)
+
+Concentrations are in molar: c in the cytoplasm, m and n at the plasma membrane and the
+internal membranes (per unit volume of cortex). Association constants (ka for dimers,
+km and kn for the two membranes) are not log-transformed here.
+
+Parameters may be scalars or arrays. Arrays are broadcast against each other, so a whole
+grid of parameter sets can be solved in one call, e.g.
+    model.equilibrium(ka=kas[np.newaxis, :], km=kms[:, np.newaxis], kn=..., dosage=...)
+
+"""
+
+
+def dimer_potential(x, ka):
+    # Chemical potential of a monomer-dimer mixture of total concentration x (up to a
+    # constant), see notebook 'ThreeCompartmentModel/Equilibrium'
+    return np.log(x) - 0.5 * np.log(1 + 4 * ka * x + np.sqrt(1 + 8 * ka * x))
+
+
+class ThreeCompartmentModel:
+    def __init__(
+        self, pf: Optional[float] = None, svr: float = 0.174 / 2, D: float = 0.005
+    ):
+        """
+        Args:
+            pf (float, optional): rate prefactor (M s^-1, see notebook
+                'ThreeCompartmentModel/_Prefactor'). Only needed for kinetics.
+            svr (float, optional): surface area to volume ratio. Defaults to 0.174 / 2.
+            D (float, optional): cortical thickness (um). Defaults to 0.005.
+        """
+        self.pf = pf
+        self.svr = svr
+        self.D = D
+
+    """
+    Rates
+
+    """
+
+    def kon(self, c, ka):
+        return self.pf / np.sqrt(1 + 4 * c * ka + np.sqrt(1 + 8 * c * ka))
+
+    def koff(self, m, km, ka):
+        return self.pf / (km * np.sqrt(1 + 4 * m * ka + np.sqrt(1 + 8 * m * ka)))
+
+    def dxdt(self, X, ka, km, kn):
+        """
+        Right-hand side for any number of parameter sets at once.
+
+        Args:
+            X: (3, ...) array of c, m and n
+            ka, km, kn: association constants, broadcastable against X[0]
+
+        Returns:
+            np.ndarray: (3, ...) time derivatives
+        """
+        c, m, n = X
+        r0 = self.kon(c, ka) * c  # onto membrane
+        r1 = self.koff(m, km, ka) * m  # off membrane
+        r2 = self.kon(c, ka) * c  # onto endosomes
+        r3 = self.koff(n, kn, ka) * n  # off endosomes
+        dc = self.svr * self.D * (-r0 + r1 - r2 + r3)
+        return np.array([dc, r0 - r1, r2 - r3])
+
+    """
+    Equilibrium
+
+    """
+
+    def equilibrium(self, ka, km, kn, dosage) -> np.ndarray:
+        """
+        Equilibrium concentrations for any number of parameter sets.
+
+        At equilibrium the monomer concentration in each compartment is proportional to
+        that in the cytoplasm (by km and kn), and the total amount is fixed by dosage.
+        This makes the cytoplasmic monomer concentration the root of a quadratic, so the
+        equilibrium is found exactly without iterative minimisation.
+
+        Args:
+            ka, km, kn: association constants (scalars or broadcastable arrays)
+            dosage: total concentration (cytoplasmic volume equivalent)
+
+        Returns:
+            np.ndarray: (..., 3) array of c, m and n
+        """
+        ka, km, kn, dosage = np.broadcast_arrays(
+            *[np.asarray(p, dtype=float) for p in (ka, km, kn, dosage)]
+        )
+        sd = self.svr * self.D
+
+        # Dosage is b u + a u^2 for cytoplasmic monomer concentration u (solved with the
+        # stable form of the positive root)
+        a = 2 * ka * (1 + sd * (km**2 + kn**2))
+        b = 1 + sd * (km + kn)
+        u = 2 * dosage / (b + np.sqrt(b**2 + 4 * a * dosage))
+
+        # Totals in each compartment (monomers + 2 x dimers)
+        c = u + 2 * ka * u**2
+        m = km * u + 2 * ka * (km * u) ** 2
+        n = kn * u + 2 * ka * (kn * u) ** 2
+        return np.stack([c, m, n], axis=-1)
+
+    """
+    Kinetics
+
+    """
+
+    def solve_kinetic(
+        self,
+        ka,
+        km,
+        kn,
+        timepoints: np.ndarray,
+        x0=None,
+        dosage=None,
+        chunk_size: int = 1024,
+        rtol: Optional[float] = None,
+        atol: float = 1e-10,
+    ) -> np.ndarray:
+        """
+        Integrates the model for any number of parameter sets.
+
+        Parameter sets are integrated together as one stacked ODE system, chunk_size at
+        a time. States are interleaved so that the Jacobian is banded, which keeps the
+        cost of implicit steps linear in the number of systems. Tolerances default to
+        those of the original notebook (odeint defaults, with atol=1e-10). Steps are
+        chosen for the stacked system as a whole, so results agree with integrating each
+        parameter set on its own to within these tolerances, rather than exactly.
+
+        Args:
+            ka, km, kn: association constants (scalars or broadcastable arrays)
+            timepoints (np.ndarray): times to evaluate (first is the initial time)
+            x0 (optional): (..., 3) initial c, m and n. Defaults to all protein in the
+                cytoplasm (requires dosage).
+            dosage (optional): total concentration, used for the default x0
+            chunk_size (int, optional): number of parameter sets per stacked system.
+                Defaults to 1024.
+            rtol (float, optional): relative tolerance. Defaults to None (the odeint
+                default, about 1.5e-8).
+            atol (float, optional): absolute tolerance. Defaults to 1e-10.
+
+        Returns:
+            np.ndarray: (..., n timepoints, 3) array of c, m and n
+        """
+        if x0 is None:
+            x0 = np.stack(np.broadcast_arrays(dosage, 1e-100, 1e-100), axis=-1)
+        x0 = np.asarray(x0, dtype=float)
+        shape = np.broadcast_shapes(
+            np.shape(ka), np.shape(km), np.shape(kn), x0.shape[:-1]
+        )
+        ka, km, kn = [np.broadcast_to(p, shape).ravel() for p in (ka, km, kn)]
+        x0 = np.broadcast_to(x0, shape + (3,)).reshape(-1, 3)
+
+        output = np.empty((len(x0), len(timepoints), 3))
+        for start in range(0, len(x0), chunk_size):
+            s = slice(start, start + chunk_size)
+            n_sets = len(x0[s])
+
+            def rhs(y, t, ka=ka[s], km=km[s], kn=kn[s]):
+                # y = [c0, m0, n0, c1, m1, n1, ...]
+                return self.dxdt(y.reshape(n_sets, 3).T, ka, km, kn).T.ravel()
+
+            sol = odeint(
+                rhs, x0[s].ravel(), t=timepoints, ml=2, mu=2, rtol=rtol, atol=atol
+            )
+            output[s] = sol.reshape(len(timepoints), n_sets, 3).transpose(1, 0, 2)
+        return output.reshape(shape + (len(timepoints), 3))
@@ -0,0 +1,165 @@
+from functools import partialmethod
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2, norm
+
+from src.dimer_model_fit import (
+    EnergiesConfidenceIntervalPaired,
+    jacobians,
+    model_log_paired,
+    model_log_paired_D,
+    model_m_from_c,
+    model_m_from_c_fast,
+    model_paired,
+)
+
+
+def paired_data(n, seed=0):
+    # n embryos of each genotype, from the dimer model with log-normal noise
+    rng = np.random.default_rng(seed)
+    genotype = np.repeat(["WT", "L109R"], n)
+    ka = np.where(genotype == "WT", 10**6.446, 10**5.7)
+    cyt = 10 ** rng.uniform(-8, -6, 2 * n)
+    mem = model_m_from_c(ka, 10**2.4, cyt) * 10 ** rng.normal(0, 0.05, 2 * n)
+    return pd.DataFrame(
+        {"Cyt": cyt, "Mem_post": mem, "Genotype": genotype, "UniPol": "Uni"}
+    )
+
+
+def analysis(**kwargs):
+    options = dict(
+        log=True, p0=(6.446, 6.446, 2.5), seed=0, n_bootstrap=20, cache=False
+    )
+    return EnergiesConfidenceIntervalPaired(paired_data(30), **dict(options, **kwargs))
+
+
+@pytest.mark.parametrize("fast_fit", [False, True])
+def test_bootstrap_worker_count_parity(fast_fit):
+    serial = analysis(fast_fit=fast_fit, n_workers=1, chunk_size=20)
+    parallel = analysis(fast_fit=fast_fit, n_workers=2, chunk_size=3)
+    np.testing.assert_array_equal(serial.params, parallel.params)
+    np.testing.assert_array_equal(serial.fit_counts, parallel.fit_counts)
+
+
+def test_bootstrap_no_samples():
+    a = analysis()
+    params, counts = a.bootstrap_fitting(
+        [a.cyts, a.l109r], a.mems, n=0, full_output=True
+    )
+    assert params.shape == (0, 3) and counts.shape[0] == 0
+
+
+@pytest.mark.parametrize("fix_wt", [False, True])
+def test_single_fit_counts(fix_wt):
+    # Default fit path: lm (unbounded) counts finite difference calls in nfev, trf
+    # (bounded, as a parameter is fixed) doesn't
+    a = analysis(fix_wt=fix_wt)
+    _, counts = a.single_fit([a.cyts, a.l109r], a.mems, full_output=True)
+    assert counts[1] > 0
+    if fix_wt:
+        assert counts[0] - len(a.p0_curve_fit) * counts[1] == counts[2]
+    else:
+        assert counts[0] == counts[2]
+
+
+@pytest.mark.parametrize("seed", [0, None])
+def test_cache_extend_matches_direct(tmp_path, seed):
+    # Samples loaded from the cache then extended match those generated in one go
+    np.random.seed(1)
+    analysis(seed=seed, n_bootstrap=10, cache=str(tmp_path)).params
+    np.random.seed(1)
+    cached = analysis(seed=seed, n_bootstrap=10, cache=str(tmp_path))
+    cached.params
+    cached.n_bootstrap = 20
+    np.random.seed(1)
+    direct = analysis(seed=seed, n_bootstrap=20)
+    np.testing.assert_array_equal(cached.params, direct.params)
+
+
+@pytest.mark.parametrize("fix_wt", [False, True])
+def test_profile_ci(fix_wt):
+    # With many points and little noise, the profile is close to quadratic, so intervals
+    # match the asymptotic (Wald) intervals, and the statistic reaches the threshold at
+    # the bounds
+    a = analysis(fix_wt=fix_wt)
+    for j in a.free_params:
+        profile = a.profile_likelihood(j)
+        lower, upper = profile["ci"]
+        half_width = norm.ppf(0.975) * np.sqrt(a.covariance[j, j])
+        assert lower < a.popt_full[j] < upper
+        np.testing.assert_allclose((upper - lower) / 2, half_width, rtol=0.05)
+        for bound in (lower, upper):
+            _, rss, _ = a._profile_fit(j, bound, a.popt_full)
+            statistic = len(a.mems) * np.log(rss / a.rss_full)
+            np.testing.assert_allclose(statistic, chi2.ppf(0.95, 1), atol=0.01)
+        assert profile["counts"][1] > 0
+
+
+def test_profile_bands_with_unbounded_ci(monkeypatch):
+    # One step is too few to reach the threshold, so the intervals of ka are unbounded,
+    # and dimer fraction bands span from no dimer to all dimer
+    monkeypatch.setattr(
+        EnergiesConfidenceIntervalPaired,
+        "profile_likelihood",
+        partialmethod(EnergiesConfidenceIntervalPaired.profile_likelihood, max_steps=1),
+    )
+    a = analysis(ci_method="profile")
+    with pytest.warns(UserWarning, match="does not reach"):
+        cis = a.profile_cis
+    assert np.isinf(cis[:2]).all()
+    for j in range(2):
+        for name in ["cyt_dim", "mem_dim"]:
+            np.testing.assert_array_equal(getattr(a, name + "_lower")[j], 0)
+            np.testing.assert_array_equal(getattr(a, name + "_upper")[j], 100)
+        assert np.isfinite(a.all_fits_lower[j]).all()
+
+
+@pytest.mark.parametrize("ka, km", [(10**6.446, 10**2.4), (10**5.7, 10**0.1), (1, 1)])
+def test_fast_model_matches_full_expression(ka, km):
+    # c * ka from 1e-12 (all monomer) to 1e16 (all dimer)
+    c = 10 ** np.linspace(-12, 16, 2801) / ka
+    np.testing.assert_allclose(
+        model_m_from_c_fast(ka, km, c), model_m_from_c(ka, km, c), rtol=1e-12
+    )
+
+
+def test_fast_log_model_matches_default():
+    data = paired_data(30)
+    logcyt_l109r = [np.log10(data.Cyt), (data.Genotype == "L109R").to_numpy() * 1]
+    np.testing.assert_allclose(
+        model_log_paired(logcyt_l109r, 6.446, 5.7, 2.4, fast=True),
+        model_log_paired(logcyt_l109r, 6.446, 5.7, 2.4),
+        rtol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("model", list(jacobians), ids=lambda m: m.__name__)
+def test_jacobian_matches_finite_differences(model, fast):
+    data = paired_data(10)
+    cyt = data.Cyt.to_numpy()
+    l109r = (data.Genotype == "L109R").to_numpy() * 1
+    x = [cyt if model is model_paired else np.log10(cyt), l109r]
+    p = np.array([6.446, 5.7, 2.4, 0.1][: 4 if model is model_log_paired_D else 3])
+    h = 1e-6
+    expected = np.stack(
+        [
+            (model(x, *(p + h * e), fast=fast) - model(x, *(p - h * e), fast=fast))
+            / (2 * h)
+            for e in np.eye(len(p))
+        ],
+        axis=-1,
+    )
+    np.testing.assert_allclose(jacobians[model](x, *p, fast=fast), expected, rtol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "options", [{}, {"fit_D": True}, {"fix_wt": True}], ids=["default", "D", "fix_wt"]
+)
+def test_fast_fit_matches_default(options):
+    # Analytic Jacobian, warm starts and the reduced model give the same estimates as
+    # the default path, to within the tolerance stated in the docstring
+    fast = analysis(fast_fit=True, fast_model=True, **options)
+    np.testing.assert_allclose(fast.params, analysis(**options).params, atol=1e-3)
@@ -0,0 +1,27 @@
+import os
+import stat
+
+import matplotlib.pyplot as plt
+
+from src.figures import export_figure, export_report
+
+
+def test_export_figure_permissions_and_cache(tmp_path):
+    fig, ax = plt.subplots()
+    ax.plot([0, 1], [0, 1])
+    path = str(tmp_path / "Figs" / "line")
+    umask = os.umask(0o022)
+    try:
+        export_figure(fig, path, n_workers=1)
+        os.chmod(path + ".pdf", 0o640)
+        export_figure(fig, path, formats=("png", "pdf"), dpi=100, n_workers=1)
+    finally:
+        os.umask(umask)
+        plt.close(fig)
+    assert stat.S_IMODE(os.stat(path + ".png").st_mode) == 0o644
+    assert stat.S_IMODE(os.stat(path + ".pdf").st_mode) == 0o640
+
+    # Second export skips the PDF (unchanged options), but not the PNG (new dpi)
+    log = export_report()
+    last = log[log.Figure == path].tail(3).set_index("Format")
+    assert not last.loc["png", "Skipped"] and last.loc["pdf", "Skipped"]
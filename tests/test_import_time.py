@@ -0,0 +1,51 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Cold import of src.stats (seconds, best of 3 runs in fresh interpreters)
+import_time_budget = 1.0
+
+# Dependencies that src.stats shouldn't pull in
+heavy_modules = ["par_segmentation", "jax", "scipy", "matplotlib", "seaborn"]
+
+
+def cold_import(module):
+    # Import in a fresh interpreter with python -X importtime
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, json, %s; print(json.dumps(sorted(sys.modules)))" % module,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Cumulative time (us) of top-level src imports (nested imports are indented)
+    total = 0
+    for line in output.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            _, cumulative, name = line.split("|")
+            if name.startswith(" src") and not name.startswith("  "):
+                total += int(cumulative)
+    return total / 1e6, json.loads(output.stdout)
+
+
+def test_stats_import_time():
+    time, _ = min(cold_import("src.stats") for _ in range(3))
+    assert time < import_time_budget, "import src.stats took %.2fs (budget %.2fs)" % (
+        time,
+        import_time_budget,
+    )
+
+
+@pytest.mark.parametrize("module", ["src", "src.stats"])
+def test_no_heavy_imports(module):
+    _, modules = cold_import(module)
+    loaded = [m for m in modules if m.split(".")[0] in heavy_modules]
+    assert not loaded, "import %s loaded %s" % (module, ", ".join(loaded))
@@ -0,0 +1,33 @@
+import os
+
+import nbformat
+
+from src.pipeline import notebook_io
+
+
+def test_notebook_io_helpers(tmp_path):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(
+        nbformat.v4.new_code_cell(
+            'quantify_manifest("embryos.csv", "quantification.csv", chunk_size=10)\n'
+            'export_figure(fig, "Figs/a", formats=("png", "svg"), dpi=300)\n'
+            'export_figure(fig, "Figs/b")\n'
+            "add_stats_table_row(\n"
+            '    "Fig 1", "A", "WT", "L109R", "ratio", 1, (3, 3), dist, key="k"\n'
+            ")\n"
+        )
+    )
+    path = tmp_path / "nb" / "notebook.ipynb"
+    path.parent.mkdir()
+    nbformat.write(nb, str(path))
+    inputs, outputs = notebook_io(str(path))
+    files = [
+        "quantification.csv",
+        "Figs/a.png",
+        "Figs/a.svg",
+        "Figs/b.png",
+        "Figs/b.pdf",
+        "../../../data/stats_table.csv",
+    ]
+    assert inputs == {os.path.join(path.parent, "embryos.csv")}
+    assert outputs == {os.path.normpath(os.path.join(path.parent, f)) for f in files}
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+pytest.importorskip("par_segmentation")
+
+from src.quantification import _resume  # noqa: E402
+
+
+def write_progress(output, records):
+    with open(output + ".progress", "w") as f:
+        for size, ids in records:
+            f.write(json.dumps({"size": size, "ids": ids}) + "\n")
+
+
+def test_resume_truncates_partly_written_chunk(tmp_path):
+    output = str(tmp_path / "res.csv")
+    with open(output, "w") as f:
+        f.write("header\nrow1\nrow2\npartial")
+    write_progress(output, [(12, ["1"]), (17, ["2"])])
+    assert _resume(output) == {"1", "2"}
+    with open(output) as f:
+        assert f.read() == "header\nrow1\nrow2\n"
+
+
+def test_resume_starts_over_if_output_missing(tmp_path):
+    output = str(tmp_path / "res.csv")
+    write_progress(output, [(12, ["1"])])
+    with pytest.warns(UserWarning, match="starting over"):
+        assert _resume(output) == set()
+    with open(output + ".progress") as f:
+        assert f.read() == ""
+
+
+def test_resume_starts_over_if_output_short(tmp_path):
+    output = str(tmp_path / "res.csv")
+    with open(output, "w") as f:
+        f.write("header\n")
+    write_progress(output, [(12, ["1"])])
+    with pytest.warns(UserWarning, match="starting over"):
+        assert _resume(output) == set()
+    with open(output, "rb") as f:
+        assert f.read() == b""
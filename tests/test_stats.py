@@ -0,0 +1,82 @@
+import os
+import stat
+
+import numpy as np
+import pytest
+
+from src.stats import StatsTable, bootstrap, chunked_percentile
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return [rng.normal(0, 1, 20), rng.normal(1, 1, 31)]
+
+
+def mean_difference(x):
+    return np.mean(x[1]) - np.mean(x[0])
+
+
+def mean_difference_batch(x):
+    return np.mean(x[1], axis=-1) - np.mean(x[0], axis=-1)
+
+
+@pytest.mark.parametrize("batch_func", [None, mean_difference_batch])
+def test_batch_bootstrap_matches_loop(data, batch_func):
+    loop = bootstrap(data, mean_difference, niter=200, rng=np.random.RandomState(1))
+    batch = bootstrap(
+        data,
+        mean_difference,
+        niter=200,
+        batch=True,
+        batch_func=batch_func,
+        rng=np.random.RandomState(1),
+    )
+    np.testing.assert_allclose(batch, loop)
+
+
+def test_batch_bootstrap_matches_loop_global_seed(data):
+    np.random.seed(2)
+    loop = bootstrap(data, mean_difference, niter=200)
+    np.random.seed(2)
+    batch = bootstrap(
+        data, mean_difference, niter=200, batch=True, batch_func=mean_difference_batch
+    )
+    np.testing.assert_allclose(batch, loop)
+
+
+@pytest.mark.parametrize("n", [1, 7, 1000])
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_chunked_percentile_matches_percentile(n, chunk_size):
+    params = np.random.default_rng(n).normal(size=(n, 2))
+    x = np.linspace(0, 1, 5)
+
+    def func(p):
+        return p[:, :1] + p[:, 1:] * x
+
+    q = [0, 2.5, 50, 97.5, 100]
+    np.testing.assert_allclose(
+        chunked_percentile(func, params, q, chunk_size=chunk_size),
+        np.percentile(func(params), q, axis=0),
+    )
+
+
+def test_stats_table_keeps_permissions(tmp_path):
+    path = str(tmp_path / "stats_table.csv")
+    row = dict(
+        figure="1",
+        panel="A",
+        sample_a="WT",
+        sample_b="L109R",
+        measure="ratio",
+        effect_size=1.0,
+        sample_size=(3, 3),
+        probability_distribution=np.arange(10.0),
+    )
+    with StatsTable(path) as table:
+        table.add_row(key="a", **row)
+    os.chmod(path, 0o640)
+    with StatsTable(path) as table:
+        table.add_row(key="b", **row)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert len(open(path).readlines()) == 3
@@ -0,0 +1,45 @@
+import os
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.storage import load_table, read_quantification, save_table
+
+
+def quantification(ids):
+    lengths = [3, 5, 2]
+    return pd.DataFrame(
+        {
+            "EmbryoID": np.repeat(ids, lengths),
+            "Position": np.concatenate([np.arange(n) for n in lengths]),
+            "Membrane signal": np.arange(sum(lengths), dtype=float),
+            "Cytoplasmic signal": np.arange(sum(lengths), dtype=float) / 2,
+        }
+    )
+
+
+@pytest.mark.parametrize("ids", [[1556901861, 1556902003, 1556902167], ["a", "b", "c"]])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, ids, mmap):
+    df = quantification(ids)
+    save_table(df, str(tmp_path / "table.bundle"))
+    table = load_table(str(tmp_path / "table.bundle"), mmap=mmap)
+    pd.testing.assert_frame_equal(table.to_frame(), df, check_dtype=False)
+    np.testing.assert_array_equal(
+        table.values("Membrane signal", table.index(ids[1])), [3, 4, 5, 6, 7]
+    )
+
+
+def test_read_quantification_permissions(tmp_path):
+    csv_path = str(tmp_path / "quantification.csv")
+    quantification(["a", "b", "c"]).to_csv(csv_path, index=False)
+    umask = os.umask(0o022)
+    try:
+        table = read_quantification(csv_path)
+    finally:
+        os.umask(umask)
+    assert table.ids.tolist() == ["a", "b", "c"]
+    mode = os.stat(str(tmp_path / "quantification.bundle")).st_mode
+    assert stat.S_IMODE(mode) == 0o755
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from src.summary import bounded_means
+
+par_segmentation = pytest.importorskip("par_segmentation")
+
+
+@pytest.mark.parametrize("bounds", [(0, 1), (0.4, 0.6), (0.9, 0.1), (0.95, 0.05)])
+def test_bounded_means_matches_bounded_mean_1d(bounds):
+    rng = np.random.default_rng(0)
+    lengths = np.array([90, 100, 37, 100])
+    array = np.full((len(lengths), lengths.max()), np.nan)
+    for i, n in enumerate(lengths):
+        array[i, :n] = rng.normal(size=n)
+    expected = [
+        par_segmentation.bounded_mean_1d(array[i, :n], bounds)
+        for i, n in enumerate(lengths)
+    ]
+    np.testing.assert_allclose(bounded_means(array, lengths, bounds), expected)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from src.three_compartment import ThreeCompartmentModel, dimer_potential
+
+svr, D, dosage = 0.174 / 2, 0.005, 1.04e-8 / (1 - 0.62)
+
+
+def solve_equilibrium_minimize(ka, km, kn):
+    # Original solver (notebook 'ThreeCompartmentModel/Equilibrium'): minimise
+    # differences in chemical potential between compartments, over the fractions of
+    # protein in each
+    def concentrations(fractions):
+        cfrac, smfrac = 1 / (1 + np.exp(-np.asarray(fractions)))
+        s = dosage * (1 - cfrac)
+        return dosage * cfrac, s * smfrac / (svr * D), s * (1 - smfrac) / (svr * D)
+
+    def loss(fractions):
+        c, m, n = concentrations(fractions)
+        mu = np.array(
+            [
+                dimer_potential(c, ka),
+                dimer_potential(m, ka) - np.log(km),
+                dimer_potential(n, ka) - np.log(kn),
+            ]
+        )
+        return np.sum((mu[:, np.newaxis] - mu[np.newaxis, :]) ** 2)
+
+    return concentrations(minimize(loss, x0=[0, 0]).x)
+
+
+@pytest.mark.parametrize("log_ka", [5, 7, 9])
+@pytest.mark.parametrize("log_km", [2.0, 2.5, 3.0])
+def test_equilibrium_matches_minimize(log_ka, log_km):
+    ka, km, kn = 10**log_ka, 10**log_km, 10 ** (log_km - 0.7)
+    model = ThreeCompartmentModel(svr=svr, D=D)
+    np.testing.assert_allclose(
+        model.equilibrium(ka=ka, km=km, kn=kn, dosage=dosage),
+        solve_equilibrium_minimize(ka, km, kn),
+        rtol=1e-4,
+    )